@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  assetbundle.py
+#
+#  packed texture atlas and asset bundle. the build step decodes every png
+#  once, packs the sprites (sprite sheet frames included) into a single
+#  atlas page, and writes the raw pixels, the sounds and a json index into
+#  one bundle file. at runtime the bundle is memory mapped and sprites are
+#  subsurfaces of the atlas, so startup does no png or ogg decoding.
+#
+#  the index records the size and modification time of every source file
+#  and the bundle is rebuilt automatically when any of them change.
+#
+#  the first time a bundle is opened against a display format each sprite
+#  is benchmarked in the forms it can be drawn in (see blitformats.py) and
+#  the quickest is recorded alongside the bundle and used from then on.
+#
+#  python assetbundle.py      rebuild the bundle now
+#
+import io
+import json
+import mmap
+import os
+import pathlib
+import struct
+import tempfile
+import pygame
+import palettes
+import blitformats
+
+FILEPATH    = pathlib.Path(__file__).resolve().parent
+BUNDLE_PATH = FILEPATH.joinpath('build', 'assets.bundle')
+FORMATS_PATH = FILEPATH.joinpath('build', 'blit_formats.json')
+
+BUNDLE_MAGIC   = b'SHMUPBND'
+BUNDLE_VERSION = 1
+BUNDLE_HEADER  = struct.Struct('<8sII') # magic, version, index length
+
+# atlas pages are this wide, anything wider or taller than
+# ATLAS_MAX_SIZE gets a page of its own
+ATLAS_WIDTH    = 512
+ATLAS_MAX_SIZE = 512
+ATLAS_PADDING  = 1
+
+# images the game uses
+IMAGES = ['c64_screen.png', 'heart.png', 'edge.png',
+          'token_1.png', 'token_2.png',
+          'powerup_1.png', 'powerup_small.png', 'powerup_large.png',
+          'score_10.png', 'score_20.png', 'score_30.png', 'score_40.png', 'score_100.png',
+          'enemy_bullet_1.png', 'enemy_bullet_2.png', 'enemy_bullet_3.png', 'enemy_bullet_4.png',
+          'player_bullet_2.png',
+          'enemy_bomb.png', 'enemies.png', 'player_sheet.png']
+
+# sprite sheets are sliced into frames:
+# (sprite width, sprite height, spacing between sprites, number of frames)
+SHEETS = {
+    'enemy_bomb.png'   : (12, 12, 4, 4),
+    'enemies.png'      : (40, 32, 10, 4),
+    'player_sheet.png' : (28, 28, 4, 3),
+}
+
+# images drawn with black as a colour key, sheets include all their frames
+KEYED = {'enemies.png', 'enemy_bomb.png', 'player_sheet.png',
+         'token_1.png', 'token_2.png',
+         'powerup_1.png', 'powerup_small.png', 'powerup_large.png'}
+COLOUR_KEY = palettes.COLOUR_PICO8_BLACK
+
+SOUNDS = ['player_zap.ogg', 'player_death.ogg', 'player_gun_overheat.ogg',
+          'enemy_dead_1.ogg', 'enemy_dead_2.ogg', 'enemy_dead_3.ogg', 'enemy_dead_4.ogg',
+          'enemy_spawn_1.ogg', 'enemy_zap_1.ogg', 'enemy_bomb_1.ogg',
+          'token_1.ogg', 'powerup_1.ogg']
+
+#=======================================================================
+# helpers
+#=======================================================================
+
+def imagePath(name):
+
+    return FILEPATH.joinpath('png', name)
+
+def soundPath(name):
+
+    return FILEPATH.joinpath('sounds', name)
+
+def sourceStamps():
+
+    # path -> [size, mtime] of every source file the bundle is built from
+    stamps = {}
+    for path in [imagePath(n) for n in IMAGES] + [soundPath(n) for n in SOUNDS]:
+        st = path.stat()
+        stamps[str(path.relative_to(FILEPATH))] = [st.st_size, st.st_mtime_ns]
+    return stamps
+
+def spriteRects(name, width, height):
+
+    # the frames of a sheet, or the whole image
+    if name not in SHEETS:
+        return [(name, pygame.Rect(0, 0, width, height))]
+
+    sprite_width, sprite_height, spacing, count = SHEETS[name]
+    rects = []
+    for n in range(count):
+        rects.append(('{}#{}'.format(name, n), pygame.Rect(n * (sprite_width + spacing), 0, sprite_width, sprite_height)))
+    return rects
+
+def packShelves(sizes, width):
+
+    # simple shelf packer, tallest first. returns positions in input order
+    # and the height of the page
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x = 0
+            y += shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        positions[i] = (x, y)
+        x += w + ATLAS_PADDING
+        shelf_height = max(shelf_height, h)
+
+    return positions, y + shelf_height
+
+#=======================================================================
+# bundle builder
+#=======================================================================
+
+def build(path = BUNDLE_PATH):
+
+    blobs   = []
+    offset  = 0
+    index   = {'version': BUNDLE_VERSION, 'sources': sourceStamps(), 'pages': [], 'sprites': {}, 'sounds': {}}
+
+    def addBlob(data):
+
+        nonlocal offset
+        start = offset
+        blobs.append(data)
+        offset += len(data)
+        return start
+
+    def addPage(surface):
+
+        data = pygame.image.tobytes(surface, 'RGB')
+        index['pages'].append({'offset': addBlob(data), 'length': len(data), 'size': list(surface.get_size())})
+        return len(index['pages']) - 1
+
+    # slice every image into sprites, big ones get their own page
+    packed = []
+    for name in IMAGES:
+        img = pygame.image.load(str(imagePath(name)))
+        for sprite, rect in spriteRects(name, *img.get_size()):
+            if rect.width > ATLAS_MAX_SIZE or rect.height > ATLAS_MAX_SIZE:
+                page = addPage(img.subsurface(rect))
+                index['sprites'][sprite] = {'page': page, 'rect': [0, 0, rect.width, rect.height]}
+            else:
+                packed.append((sprite, img.subsurface(rect)))
+
+    positions, height = packShelves([s.get_size() for _, s in packed], ATLAS_WIDTH)
+    atlas = pygame.Surface((ATLAS_WIDTH, height))
+    atlas.fill((0, 0, 0))
+    page = len(index['pages'])
+    for (sprite, surface), (x, y) in zip(packed, positions):
+        atlas.blit(surface, (x, y))
+        index['sprites'][sprite] = {'page': page, 'rect': [x, y] + list(surface.get_size())}
+    addPage(atlas)
+
+    # sounds keep their ogg data, plus the decoded samples when the mixer
+    # is running so a matching mixer can skip decoding altogether
+    mixer_format = pygame.mixer.get_init()
+    for name in SOUNDS:
+        data  = soundPath(name).read_bytes()
+        entry = {'offset': addBlob(data), 'length': len(data)}
+        if mixer_format:
+            raw = pygame.mixer.Sound(str(soundPath(name))).get_raw()
+            entry['raw'] = {'offset': addBlob(raw), 'length': len(raw), 'format': list(mixer_format)}
+        index['sounds'][name] = entry
+
+    index_data = json.dumps(index).encode('utf-8')
+    # blobs start on a 16 byte boundary after the header and index
+    start = BUNDLE_HEADER.size + len(index_data)
+    padding = (-start) % 16
+
+    # every builder writes a temp file of its own and swaps it in whole, so
+    # processes building at once never see each other's half written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', prefix=path.stem + '.', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index_data)))
+            f.write(index_data)
+            f.write(b'\0' * padding)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+#=======================================================================
+# asset bundle class
+#=======================================================================
+
+class AssetBundle():
+
+    def __init__(self, path = BUNDLE_PATH, convert = True):
+
+        self.path    = path
+        self.convert = convert # converting needs a display
+        self.file    = open(path, 'rb')
+        self.data    = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, index_length = BUNDLE_HEADER.unpack_from(self.data, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError('not a version {} asset bundle: {}'.format(BUNDLE_VERSION, path))
+
+        start = BUNDLE_HEADER.size
+        self.index = json.loads(self.data[start:start + index_length].decode('utf-8'))
+        self.data_start = start + index_length + ((-(start + index_length)) % 16)
+        self.pages = [None] * len(self.index['pages'])
+        self.formats = {} # sprite -> the blitformats form it is drawn in
+
+    def close(self):
+
+        self.pages = []
+        self.data.close()
+        self.file.close()
+
+    def isStale(self):
+
+        try:
+            return self.index['sources'] != sourceStamps()
+        except OSError:
+            return True
+
+    def blob(self, entry):
+
+        start = self.data_start + entry['offset']
+        return memoryview(self.data)[start:start + entry['length']]
+
+    def page(self, n):
+
+        # pages are made into surfaces the first time a sprite on them is wanted
+        if self.pages[n] is None:
+            entry = self.index['pages'][n]
+            surface = pygame.image.frombuffer(self.blob(entry), tuple(entry['size']), 'RGB')
+            if self.convert:
+                surface = surface.convert()
+            self.pages[n] = surface
+        return self.pages[n]
+
+    def isKeyed(self, name):
+
+        return name.split('#')[0] in KEYED
+
+    def chooseFormats(self, path = FORMATS_PATH):
+
+        # needs a display. loads the choices made on an earlier run or
+        # benchmarks every atlas sprite now and saves them
+        st = os.stat(self.path)
+        stamp = '{}:{}'.format(st.st_size, st.st_mtime_ns)
+        results = blitformats.load(path, stamp)
+
+        if results is None:
+            sprites = {}
+            for name, sprite in self.index['sprites'].items():
+                w, h = sprite['rect'][2:]
+                if w <= ATLAS_MAX_SIZE and h <= ATLAS_MAX_SIZE:
+                    sprites[name] = (self.page(sprite['page']).subsurface(sprite['rect']), self.isKeyed(name))
+            results = blitformats.benchmark(sprites, COLOUR_KEY)
+            blitformats.save(path, stamp, results)
+            usual, chosen = blitformats.report(results)
+            print('blit formats: {} sprites benchmarked, {:.1f}us to draw each once as before, {:.1f}us now ({:.0f}% saved)'.format(
+                  len(results), usual, chosen, (usual - chosen) / usual * 100.0))
+
+        self.formats = {name: r['format'] for name, r in results.items()}
+
+    def image(self, name):
+
+        sprite  = self.index['sprites'][name]
+        surface = self.page(sprite['page']).subsurface(sprite['rect'])
+        usual   = blitformats.FORMAT_COLORKEY if self.isKeyed(name) else blitformats.FORMAT_OPAQUE
+        return blitformats.applyFormat(surface, self.formats.get(name, usual), COLOUR_KEY)
+
+    def frames(self, name):
+
+        return [self.image('{}#{}'.format(name, n)) for n in range(SHEETS[name][3])]
+
+    def sound(self, name):
+
+        entry = self.index['sounds'][name]
+        raw = entry.get('raw')
+        if raw is not None and tuple(raw['format']) == pygame.mixer.get_init():
+            return pygame.mixer.Sound(buffer=self.blob(raw))
+        return pygame.mixer.Sound(file=io.BytesIO(self.blob(entry)))
+
+def openCurrent(path, convert):
+
+    # the bundle if it is there and up to date, else None
+    try:
+        bundle = AssetBundle(path, convert)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    if bundle.isStale():
+        bundle.close()
+        return None
+    return bundle
+
+def openBundle(path = BUNDLE_PATH, convert = True):
+
+    # opens the bundle, building it first if it is missing or out of date.
+    # another process may finish building at the same time and swap its
+    # own bundle in, which is just as good as long as it is current
+    bundle = openCurrent(path, convert)
+    if bundle is None:
+        build(path)
+        bundle = openCurrent(path, convert)
+    if bundle is None:
+        raise ValueError('asset bundle is out of date straight after building it: {}'.format(path))
+
+    if convert:
+        bundle.chooseFormats()
+    return bundle
+
+
+if __name__ == '__main__':
+    pygame.mixer.init()
+    build()
+    print('built', BUNDLE_PATH)
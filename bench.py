@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  bench.py
+#
+#  scenario benchmarks. drives the game through scripted scenarios on the
+#  sdl dummy video and audio drivers, so every blit is real but nothing is
+#  shown or heard, and reports frame times broken down by subsystem.
+#
+#  python bench.py                          run every scenario
+#  python bench.py bullet_storm --frames 2000
+#  python bench.py --output new.json --compare old.json
+#
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import random
+import time
+import numpy as np
+import pygame
+import shmup1
+import profiler
+
+# frames run before timing starts so caches and pools are warm
+WARMUP_FRAMES = 60
+
+# subsystem -> the profiler phases it is made of. a name ending in '.'
+# matches every phase starting with it
+SUBSYSTEMS = {
+    'collisions'     : ['doCollisions'],
+    'clearTheDead'   : ['clearTheDead'],
+    'particles'      : ['psc.update', 'draw.particles'],
+    'entity_updates' : ['update.'],
+    'blits'          : ['draw.background', 'draw.player_bullets', 'draw.enemies', 'draw.enemy_bullets',
+                        'draw.tokens', 'draw.powerups', 'draw.player', 'draw.screen', 'drawArena', 'draw.flush'],
+    'audio'          : ['voices'],
+    'present'        : ['display.flip'],
+}
+
+#=======================================================================
+# scenario helpers
+#=======================================================================
+
+def startPlaying(game):
+
+    game.spaceBarPressed()
+
+def keepPlaying(game):
+
+    # the player can't die during a benchmark, a hit just carries on
+    if game.gamestate == shmup1.GAME_STATE_LIFE_LOST:
+        game.gamestate = shmup1.GAME_STATE_IN_PROGRESS
+        game.gamestate_delay = 0
+    game.player.lives = 3
+
+#=======================================================================
+# scenarios - each is a setup(game) and a step(game, frame) run before
+# every update
+#=======================================================================
+
+def introSetup(game):
+
+    pass
+
+def introStep(game, frame):
+
+    pass
+
+def bulletStormStep(game, frame):
+
+    # keep a few hundred enemy bullets raining down either side of the
+    # player, so the frame is spent on bullets rather than death bursts
+    while len(game.enemy_bullets) < 250:
+        x  = random.randint(40, shmup1.SCREEN_WIDTH - 140)
+        if x > game.player.pos.x - 40:
+            x += 100
+        y  = random.randint(-100, 200)
+        vx = 0
+        vy = random.uniform(3.0, 8.0)
+        before = len(game.enemy_bullets)
+        game.addEnemyBullet(x, y, vx, vy, random.randint(0, 3))
+        if len(game.enemy_bullets) == before:
+            break
+
+def killChainStep(game, frame):
+
+    # a few kills every frame, each with its explosion and score popup
+    for n in range(3):
+        x = random.randint(40, shmup1.SCREEN_WIDTH - 80)
+        y = random.randint(40, shmup1.SCREEN_HEIGHT - 200)
+        game.psc.spawnBurstCircle(x, y, 10)
+        game.psc.spawnScoreBurst(x, y, game.score_images[random.randint(0, 3)])
+
+def tripleShotSetup(game):
+
+    startPlaying(game)
+    game.player.gun_level = game.player.gun_level_max
+
+def tripleShotStep(game, frame):
+
+    # fire every frame with a gun that never overheats, sweeping side to side
+    game.player.gun_heat = 0
+    game.player.gun_level = game.player.gun_level_max
+    game.fire()
+    if frame % 60 == 0:
+        game.player.move(shmup1.D_LEFT)
+    elif frame % 60 == 30:
+        game.player.move(shmup1.D_RIGHT)
+
+SCENARIOS = {
+    'intro_idle'   : (introSetup, introStep),
+    'bullet_storm' : (startPlaying, bulletStormStep),
+    'kill_chain'   : (startPlaying, killChainStep),
+    'triple_shot'  : (tripleShotSetup, tripleShotStep),
+}
+
+#=======================================================================
+# runner
+#=======================================================================
+
+def phasesFor(prof, names):
+
+    phases = []
+    for name in names:
+        if name.endswith('.'):
+            phases += [p for p in prof.phases if p.startswith(name)]
+        else:
+            phases.append(name)
+    return phases
+
+def stats(seconds):
+
+    ms = np.asarray(seconds) * 1000.0
+    return {'mean': float(ms.mean()), 'p95': float(np.percentile(ms, 95)), 'p99': float(np.percentile(ms, 99))}
+
+def runScenario(name, frames, seed):
+
+    setup, step = SCENARIOS[name]
+    random.seed(seed)
+
+    game = shmup1.Game(seed=seed)
+    setup(game)
+
+    prof = profiler.FrameProfiler(frames)
+
+    for frame in range(WARMUP_FRAMES + frames):
+        if frame == WARMUP_FRAMES:
+            game.profiler = prof
+
+        prof.beginFrame()
+        step(game, frame)
+        game.update()
+        if name != 'intro_idle':
+            keepPlaying(game)
+        game.draw()
+        prof.begin('display.flip')
+        pygame.display.flip()
+        prof.end('display.flip')
+        prof.endFrame()
+
+    totals, samples = prof.history()
+    result = {
+        'frames'     : frames,
+        'frame_ms'   : stats(totals),
+        'subsystems' : {},
+        'counts'     : dict(prof.counters),
+    }
+    for subsystem, names in SUBSYSTEMS.items():
+        result['subsystems'][subsystem] = stats(prof.phaseHistory(phasesFor(prof, names)))
+
+    return result
+
+def printResult(name, result, baseline = None):
+
+    frame = result['frame_ms']
+    line = '{:<14} mean {:7.3f}ms  p95 {:7.3f}ms  p99 {:7.3f}ms'.format(name, frame['mean'], frame['p95'], frame['p99'])
+    if baseline is not None:
+        change = (frame['mean'] - baseline['frame_ms']['mean']) / baseline['frame_ms']['mean'] * 100.0
+        line += '  ({:+.1f}% mean)'.format(change)
+    print(line)
+
+    for subsystem, s in result['subsystems'].items():
+        print('    {:<16} mean {:7.3f}ms  p95 {:7.3f}ms  p99 {:7.3f}ms'.format(subsystem, s['mean'], s['p95'], s['p99']))
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Shmup1 scenario benchmarks')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run, default all of ' + ', '.join(SCENARIOS))
+    parser.add_argument('--frames', type=int, default=600, help='timed frames per scenario')
+    parser.add_argument('--seed', type=int, default=1, help='random seed so runs are repeatable')
+    parser.add_argument('--output', default='bench_results.json', help='json file the results are written to')
+    parser.add_argument('--compare', metavar='JSON', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario ' + name)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['scenarios']
+
+    shmup1.initPygame()
+
+    results = {
+        'meta': {
+            'time'    : time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python'  : platform.python_version(),
+            'pygame'  : pygame.version.ver,
+            'machine' : platform.machine(),
+            'frames'  : args.frames,
+            'seed'    : args.seed,
+        },
+        'scenarios': {},
+    }
+
+    for name in names:
+        result = runScenario(name, args.frames, args.seed)
+        results['scenarios'][name] = result
+        printResult(name, result, baseline.get(name) if baseline else None)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  blitformats.py
+#
+#  picks how each sprite is stored for drawing. a sprite can be an opaque
+#  surface, a colour keyed one, a run length encoded colour keyed one or a
+#  per pixel alpha one, and which blits fastest depends on the sprite and
+#  on the display format. so rather than guess, the first time the game
+#  runs against a display format every sprite is blitted in each form that
+#  draws exactly the same pixels, the quickest is kept, and the choices
+#  are saved next to the asset bundle for later runs.
+#
+import json
+import os
+import time
+import numpy as np
+import pygame
+
+FORMATS_VERSION = 1
+
+# the forms a sprite can take, the first is how a plain sprite is drawn
+# and the second how a colour keyed one is, which is what the others must
+# match pixel for pixel
+FORMAT_OPAQUE   = 'opaque'
+FORMAT_COLORKEY = 'colorkey'
+FORMAT_RLE      = 'rle'
+FORMAT_ALPHA    = 'alpha'
+FORMATS         = (FORMAT_OPAQUE, FORMAT_COLORKEY, FORMAT_RLE, FORMAT_ALPHA)
+
+BENCH_BLITS   = 64 # blits per timing, spread over the target
+BENCH_REPEATS = 3  # the fastest of this many timings is used
+
+#=======================================================================
+# helpers
+#=======================================================================
+
+def applyFormat(surface, fmt, key):
+
+    # the sprite in the given form. the keyed forms other than a plain
+    # colour key need a surface of their own, not a view into the atlas
+    if fmt == FORMAT_COLORKEY:
+        surface.set_colorkey(key)
+    elif fmt == FORMAT_RLE:
+        surface = surface.copy()
+        surface.set_colorkey(key, pygame.RLEACCEL)
+    elif fmt == FORMAT_ALPHA:
+        keyed = surface.copy()
+        keyed.set_colorkey(key)
+        surface = keyed.convert_alpha()
+    return surface
+
+def displaySignature():
+
+    # formats chosen for one display format mean nothing for another
+    surface = pygame.display.get_surface()
+    return '{}:{}'.format(surface.get_bitsize(), ','.join(str(m) for m in surface.get_masks()))
+
+def drawsSame(surface, reference, background):
+
+    # blit both over the same noisy background and compare the pixels
+    a = background.copy()
+    b = background.copy()
+    a.blit(surface, (0, 0))
+    b.blit(reference, (0, 0))
+    return pygame.image.tobytes(a, 'RGB') == pygame.image.tobytes(b, 'RGB')
+
+def timeBlits(surface, target, positions):
+
+    blits = [(surface, p) for p in positions]
+    best = None
+    for n in range(BENCH_REPEATS):
+        start = time.perf_counter()
+        target.blits(blits, doreturn=False)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(positions) * 1e6 # microseconds per blit
+
+#=======================================================================
+# benchmark pass
+#=======================================================================
+
+def benchmark(sprites, key, rng = None):
+
+    # sprites is name -> (surface, keyed). returns name -> {'format': the
+    # quickest form, 'us': microseconds per blit of each form that draws
+    # the same as the sprite's usual form}
+    rng    = rng if rng is not None else np.random.default_rng(0)
+    target = pygame.Surface(pygame.display.get_surface().get_size()).convert()
+    target.fill(key)
+    results = {}
+
+    for name, (surface, keyed) in sprites.items():
+        w, h = surface.get_size()
+        usual = FORMAT_COLORKEY if keyed else FORMAT_OPAQUE
+        reference = applyFormat(surface.copy(), usual, key)
+
+        noise = rng.integers(0, 256, (w, h, 3), dtype=np.uint8)
+        background = pygame.Surface((w, h)).convert()
+        pygame.surfarray.blit_array(background, noise)
+
+        xs = rng.integers(0, max(1, target.get_width() - w), BENCH_BLITS)
+        ys = rng.integers(0, max(1, target.get_height() - h), BENCH_BLITS)
+        positions = list(zip(xs.tolist(), ys.tolist()))
+
+        costs = {}
+        for fmt in FORMATS:
+            candidate = applyFormat(surface.copy(), fmt, key)
+            if fmt == usual or drawsSame(candidate, reference, background):
+                costs[fmt] = timeBlits(candidate, target, positions)
+
+        results[name] = {'format': min(costs, key=costs.get), 'usual': usual, 'us': costs}
+
+    return results
+
+def report(results):
+
+    # (microseconds to blit every sprite once in its usual form, and in
+    # the chosen form)
+    usual  = sum(r['us'][r['usual']] for r in results.values())
+    chosen = sum(r['us'][r['format']] for r in results.values())
+    return usual, chosen
+
+#=======================================================================
+# saved choices
+#=======================================================================
+
+def load(path, stamp):
+
+    # the saved choices for this display and bundle, or None
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get('version') != FORMATS_VERSION or saved.get('bundle') != stamp:
+        return None
+    return saved.get('displays', {}).get(displaySignature())
+
+def save(path, stamp, results):
+
+    # keeps the choices made for other displays of the same bundle
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+        if saved.get('version') != FORMATS_VERSION or saved.get('bundle') != stamp:
+            saved = None
+    except (OSError, ValueError):
+        saved = None
+    if saved is None:
+        saved = {'version': FORMATS_VERSION, 'bundle': stamp, 'displays': {}}
+
+    saved['displays'][displaySignature()] = results
+    tmp = str(path) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(saved, f, indent=1)
+    os.replace(tmp, path)
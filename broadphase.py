@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  broadphase.py
+#
+#  uniform grid broadphase for the collision passes. objects are bucketed
+#  into the grid cells their rect overlaps so a query only has to look at
+#  the handful of objects near it instead of every object in a list.
+#
+
+#=======================================================================
+# helper - the area covered by a rect moving by vel in one frame
+#=======================================================================
+
+def sweptRect(rect, vel):
+
+    # fast objects can jump clean over a thin target in one frame, so test
+    # against the whole area the rect swept through since the last frame
+    previous = rect.move(-vel.x, -vel.y)
+    return rect.union(previous)
+
+#=======================================================================
+# spatial grid class
+#=======================================================================
+
+class SpatialGrid():
+
+    def __init__(self, cell_size = 64):
+
+        self.cell_size = cell_size
+        self.cells     = {} # (cx, cy) -> {obj: None}, dicts keep insertion order
+        self.entries   = {} # obj -> [cell range, sync stamp]
+        self.stamp     = 0
+
+    def cellRange(self, rect):
+
+        cs = self.cell_size
+        return (rect.left // cs, rect.top // cs, (rect.right - 1) // cs, (rect.bottom - 1) // cs)
+
+    def addToCells(self, obj, cells):
+
+        x0, y0, x1, y1 = cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    cell = self.cells[(cx, cy)] = {}
+                cell[obj] = None
+
+    def removeFromCells(self, obj, cells):
+
+        x0, y0, x1, y1 = cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[obj]
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def remove(self, obj):
+
+        entry = self.entries.pop(obj, None)
+        if entry is not None:
+            self.removeFromCells(obj, entry[0])
+
+    def clear(self):
+
+        self.cells   = {}
+        self.entries = {}
+
+    def sync(self, objects, rectfunc = None):
+
+        # bring the grid up to date with a list of live objects. objects
+        # that stayed inside the same cells since the last sync cost one
+        # tuple compare, and anything no longer in the list is dropped
+        self.stamp += 1
+        stamp = self.stamp
+
+        for obj in objects:
+            rect  = obj.rect if rectfunc is None else rectfunc(obj)
+            cells = self.cellRange(rect)
+            entry = self.entries.get(obj)
+
+            if entry is None:
+                self.entries[obj] = [cells, stamp]
+                self.addToCells(obj, cells)
+            else:
+                if entry[0] != cells:
+                    self.removeFromCells(obj, entry[0])
+                    self.addToCells(obj, cells)
+                    entry[0] = cells
+                entry[1] = stamp
+
+        if len(self.entries) > len(objects):
+            stale = [obj for obj, entry in self.entries.items() if entry[1] != stamp]
+            for obj in stale:
+                self.remove(obj)
+
+    def query(self, rect):
+
+        # returns the objects sharing a cell with rect, each one only once.
+        # these are only candidates, the caller still does the exact test
+        x0, y0, x1, y1 = self.cellRange(rect)
+        found = {}
+
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+
+        return found.keys()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  dirtyrects.py
+#
+#  frame presenters. FullFramePresenter is the normal clear the whole
+#  screen and flip it every frame. DirtyRectPresenter only clears and
+#  pushes to the display the areas that changed, taken from where things
+#  were drawn last frame and where they are drawn this frame, and falls
+#  back to a full flip when something has invalidated the whole screen.
+#
+import pygame
+
+# if the changed areas add up to more than this fraction of the screen a
+# full flip is cheaper than updating lots of small rects
+FULL_FLIP_FRACTION = 0.5
+
+#=======================================================================
+# full frame presenter class
+#=======================================================================
+
+class FullFramePresenter():
+
+    def __init__(self, colour = (0, 0, 0)):
+
+        self.colour = colour
+
+    def erase(self, surface):
+
+        surface.fill(self.colour)
+
+    def invalidateAll(self):
+
+        pass
+
+    def add(self, rect):
+
+        pass
+
+    def needsRects(self):
+
+        return False
+
+    def present(self):
+
+        pygame.display.flip()
+
+#=======================================================================
+# dirty rect presenter class
+#=======================================================================
+
+class DirtyRectPresenter():
+
+    def __init__(self, width, height, colour = (0, 0, 0)):
+
+        self.colour      = colour
+        self.bounds      = pygame.Rect(0, 0, width, height)
+        self.previous    = None # rects drawn into last frame, None for the whole screen
+        self.current     = []   # rects drawn into this frame
+        self.full        = False
+        self.full_flips  = 0
+        self.rect_frames = 0
+
+    def erase(self, surface):
+
+        # wipe out whatever was drawn last frame before drawing this one
+        if self.previous is None:
+            surface.fill(self.colour)
+        else:
+            for rect in self.previous:
+                surface.fill(self.colour, rect)
+        self.full = False
+
+    def invalidateAll(self):
+
+        self.full = True
+
+    def add(self, rect):
+
+        if not self.full:
+            self.current.append(rect)
+
+    def needsRects(self):
+
+        # nothing is gained by collecting rects for a frame that will flip
+        return not self.full
+
+    def present(self):
+
+        if self.full:
+            pygame.display.flip()
+            self.full_flips += 1
+            self.previous = None
+            self.current  = []
+            return
+
+        if self.previous is None:
+            changed = None
+        else:
+            changed = [r.clip(self.bounds) for r in self.previous + self.current]
+
+        if changed is None or sum(r.width * r.height for r in changed) > self.bounds.width * self.bounds.height * FULL_FLIP_FRACTION:
+            pygame.display.flip()
+            self.full_flips += 1
+        else:
+            pygame.display.update(changed)
+            self.rect_frames += 1
+
+        self.previous = self.current
+        self.current  = []
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  entities.py
+#
+#  component arrays for the things that fly about the arena. every kind
+#  of entity (enemies, player bullets, enemy shots, tokens, powerups) has
+#  an EntityArrays holding the components of all of them, one row each,
+#  and the systems below move, bounce, cull, animate and draw every live
+#  entity of a kind in one go rather than calling a method per object.
+#
+#  the game still deals in objects, an Entity is a thin view that owns a
+#  row and reads and writes it, so collisions, pools and spawning don't
+#  need to know the data lives in arrays. entities are pooled so rows are
+#  handed out once and never given back.
+#
+#  the systems only touch the rows of live entities, the kinds with the
+#  biggest pools rarely have more than a few of them out at once. pooled
+#  entities sit still until they are spawned again.
+#
+#  numpy costs a few microseconds a call however few rows it works on, and
+#  most kinds only have a handful alive, so below EACH_BELOW live entities
+#  a system reads and writes the rows one at a time in plain python
+#  through memoryviews of the arrays instead. both ways do the same float
+#  arithmetic in the same order, so they give identical results.
+#
+import numpy as np
+import pygame
+from vector import Vector2Array, flatView
+
+EACH_BELOW = 32 # live entities below which the systems skip numpy
+
+#=======================================================================
+# entity arrays class - the components of one kind of entity
+#=======================================================================
+
+class EntityArrays():
+
+    def __init__(self, capacity = 64, accelerates = False, bounces = False, animates = False):
+
+        # which of the optional systems this kind needs
+        self.accelerates = accelerates
+        self.bounces     = bounces
+        self.animates    = animates
+        
+        self.capacity = capacity
+        self.rows     = 0                       # rows handed out so far
+        self.pos      = Vector2Array(capacity)
+        self.prev     = Vector2Array(capacity)  # positions before the last move, for drawing between ticks
+        self.vel      = Vector2Array(capacity)
+        self.acc      = Vector2Array(capacity)
+        self.dead     = np.zeros(capacity, dtype=bool)
+        self.walls    = np.zeros((capacity, 2)) # left and right x the entity bounces between
+        self.limits   = np.zeros((capacity, 2)) # top and bottom y past which it is culled
+        self.frame    = np.zeros(capacity, dtype=np.intp)
+        self.ticks    = np.zeros(capacity, dtype=np.intp)
+        self.delay    = np.zeros(capacity, dtype=np.intp) # ticks between animation frames
+        self.frames   = np.ones(capacity, dtype=np.intp)  # number of animation frames
+        self.images   = []                      # animation frames of each row
+        self.flat     = {}                      # name -> flatView of each array above
+        self.flatten()
+
+    def flatten(self):
+
+        # the vectors keep flat views of their own
+        for name in ('dead', 'walls', 'limits', 'frame', 'ticks', 'delay', 'frames'):
+            self.flat[name] = flatView(getattr(self, name))
+
+    def grow(self, capacity):
+
+        for name in ('dead', 'walls', 'limits', 'frame', 'ticks', 'delay', 'frames'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.rows] = old[:self.rows]
+            setattr(self, name, new)
+        self.frames[self.rows:] = 1
+        self.capacity = capacity
+        self.flatten()
+
+    def alloc(self):
+
+        if self.rows == self.capacity:
+            self.grow(self.capacity * 2)
+
+        row = self.rows
+        self.rows += 1
+        self.pos.alloc()
+        self.prev.alloc()
+        self.vel.alloc()
+        self.acc.alloc()
+        self.walls[row]  = (-np.inf, np.inf)
+        self.limits[row] = (-np.inf, np.inf)
+        self.images.append([None])
+        return row
+
+#=======================================================================
+# systems - each works on the live rows of one kind
+#=======================================================================
+
+def liveRows(items):
+
+    # the rows of a kind's live entities, in list order
+    return np.fromiter((e.row for e in items), np.intp, len(items))
+
+def pairs(vectors):
+
+    # a Vector2Array seen as one complex x + yj per row, numpy picks rows
+    # out of that by index several times faster than out of float pairs
+    return vectors.array.view(np.complex128)[:, 0]
+
+def moveEach(arrays, items):
+
+    # move, bounce and animate, one entity at a time
+    pos = arrays.pos.flat
+    prev = arrays.prev.flat
+    vel = arrays.vel.flat
+    acc = arrays.acc.flat if arrays.accelerates else None
+    walls = arrays.flat['walls'] if arrays.bounces else None
+    animates = arrays.animates
+    if animates:
+        frame = arrays.flat['frame']
+        ticks = arrays.flat['ticks']
+        delay = arrays.flat['delay']
+        frames = arrays.flat['frames']
+    
+    for e in items:
+        r = e.row
+        i = r + r
+        j = i + 1
+        x = pos[i]
+        y = pos[j]
+        prev[i] = x
+        prev[j] = y
+        vx = vel[i]
+        vy = vel[j]
+        if acc is not None:
+            vx += acc[i]
+            vy += acc[j]
+            vel[j] = vy
+        x += vx
+        y += vy
+        pos[i] = x
+        pos[j] = y
+        if walls is not None and (x < walls[i] or x > walls[j]):
+            vx = -vx
+        vel[i] = vx
+        if animates:
+            t = ticks[r] + 1
+            if t > delay[r]:
+                frame[r] = (frame[r] + 1) % frames[r]
+                t = 0
+            ticks[r] = t
+
+def move(arrays, rows):
+
+    pos = pairs(arrays.pos)
+    vel = pairs(arrays.vel)
+    p = pos[rows]
+    pairs(arrays.prev)[rows] = p
+    v = vel[rows]
+    if arrays.accelerates:
+        v += pairs(arrays.acc)[rows]
+        vel[rows] = v
+    p += v
+    pos[rows] = p
+
+def bounceOffWalls(arrays, rows):
+
+    x = arrays.pos.array[rows, 0]
+    walls = arrays.walls[rows]
+    hit = (x < walls[:, 0]) | (x > walls[:, 1])
+    arrays.vel.array[rows[hit], 0] *= -1
+
+def cull(arrays, items):
+
+    # anything past its limits is dead, ready for the list to be compacted
+    if not items:
+        return
+    if len(items) < EACH_BELOW:
+        pos = arrays.pos.flat
+        limits = arrays.flat['limits']
+        dead = arrays.flat['dead']
+        for e in items:
+            r = e.row
+            y = pos[r + r + 1]
+            if y < limits[r + r] or y > limits[r + r + 1]:
+                dead[r] = True
+        return
+    rows = liveRows(items)
+    y = arrays.pos.array[rows, 1]
+    limits = arrays.limits[rows]
+    arrays.dead[rows] |= (y < limits[:, 0]) | (y > limits[:, 1])
+
+def animate(arrays, rows):
+
+    ticks = arrays.ticks[rows] + 1
+    frame = arrays.frame[rows]
+    step = ticks > arrays.delay[rows]
+    frame[step] = (frame[step] + 1) % arrays.frames[rows][step]
+    ticks[step] = 0
+    arrays.ticks[rows] = ticks
+    arrays.frame[rows] = frame
+
+def syncRects(arrays, items, rows = None):
+
+    # the hitboxes follow the positions, collisions still work on rects.
+    # the rect rounds the floats itself
+    if rows is None:
+        if len(items) < EACH_BELOW:
+            pos = arrays.pos.flat
+            for e in items:
+                i = e.row + e.row
+                e.rect.topleft = (pos[i], pos[i + 1])
+            return
+        rows = liveRows(items)
+    for e, pos in zip(items, arrays.pos.array[rows].tolist()):
+        e.rect.topleft = pos
+
+def sprites(arrays, items, alpha = 1.0):
+
+    # (image, position) of every live entity of the kind, in list order.
+    # alpha is how far the frame being drawn is from the previous tick
+    # to the current one
+    if len(items) < EACH_BELOW:
+        images  = arrays.images
+        frame   = arrays.flat['frame']
+        pos     = arrays.pos.flat
+        prev    = arrays.prev.flat
+        sprites = []
+        for e in items:
+            r = e.row
+            i = r + r
+            x = pos[i]
+            y = pos[i + 1]
+            if alpha < 1.0:
+                px = prev[i]
+                py = prev[i + 1]
+                x = px + (x - px) * alpha
+                y = py + (y - py) * alpha
+            sprites.append((images[r][frame[r]], (x, y)))
+        return sprites
+    rows   = liveRows(items)
+    images = arrays.images
+    frame  = arrays.frame[rows].tolist()
+    pos    = arrays.pos.array[rows]
+    if alpha < 1.0:
+        prev = arrays.prev.array[rows]
+        pos  = prev + (pos - prev) * alpha
+    return [(images[e.row][f], p) for e, f, p in zip(items, frame, pos.tolist())]
+
+def update(arrays, items):
+
+    # the usual systems for a kind that just flies along
+    if not items:
+        return
+    if len(items) < EACH_BELOW:
+        moveEach(arrays, items)
+        syncRects(arrays, items)
+        return
+    rows = liveRows(items)
+    move(arrays, rows)
+    if arrays.bounces:
+        bounceOffWalls(arrays, rows)
+    if arrays.animates:
+        animate(arrays, rows)
+    syncRects(arrays, items, rows)
+
+#=======================================================================
+# entity class - a view over one row of an EntityArrays
+#=======================================================================
+
+class Entity():
+
+    def __init__(self, arrays):
+
+        self.arrays = arrays
+        self.row    = arrays.alloc()
+        self.pos    = arrays.pos.view(self.row)
+        self.prev   = arrays.prev.view(self.row)
+        self.vel    = arrays.vel.view(self.row)
+        self.acc    = arrays.acc.view(self.row)
+        self.rect   = pygame.Rect(0, 0, 0, 0)
+
+    @property
+    def dead(self):
+
+        return self.arrays.flat['dead'][self.row]
+
+    @dead.setter
+    def dead(self, value):
+
+        self.arrays.flat['dead'][self.row] = value
+
+    def isDead(self):
+
+        # off screen entities are marked dead by the cull system
+        return self.arrays.flat['dead'][self.row]
+
+    def place(self, x, y, vx = 0.0, vy = 0.0):
+
+        self.pos.setFromValues(x, y)
+        self.vel.setFromValues(vx, vy)
+        self.arrays.flat['dead'][self.row] = False
+        self.rect.topleft = (x, y)
+        self.settle()
+
+    def settle(self):
+
+        # the entity jumped rather than moved, don't draw it sliding there
+        self.prev.set(self.pos)
+
+    def setFrames(self, frames, delay = 0):
+
+        row = self.row
+        self.arrays.images[row] = frames
+        self.arrays.frames[row] = len(frames)
+        self.arrays.frame[row]  = 0
+        self.arrays.ticks[row]  = 0
+        self.arrays.delay[row]  = delay
+
+    def setWalls(self, left, right):
+
+        self.arrays.walls[self.row] = (left, right)
+
+    def setLimits(self, top, bottom):
+
+        self.arrays.limits[self.row] = (top, bottom)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  glyphs.py
+#
+#  bitmap glyph atlas text renderer. each printable character is rendered
+#  through freetype once per font size and colour into a single atlas
+#  surface, then strings are composed by blitting glyphs out of it. the
+#  most recently used strings are kept ready made in an lru cache, so
+#  drawing a score that hasn't changed is just one blit.
+#
+#  long scrolling messages are never composed whole, a ticker keeps only
+#  what is inside its viewport and blits in glyphs from the atlas as they
+#  scroll into view.
+#
+import bisect
+from collections import OrderedDict
+import pygame
+import palettes
+
+# printable ascii
+ATLAS_CHARS = ''.join(chr(c) for c in range(32, 127))
+
+# pixels that are this colour are transparent in the atlas and strings
+COLOUR_KEY = palettes.COLOUR_BACKGROUND_MASK
+
+#=======================================================================
+# glyph atlas class
+#=======================================================================
+
+class GlyphAtlas():
+
+    def __init__(self, font_path, size, colour, cache_size = 64):
+
+        font = pygame.font.Font(font_path, size)
+
+        self.colour     = colour
+        self.height     = font.get_height()
+        self.glyphs     = {} # char -> rect in the atlas
+        self.cache      = OrderedDict() # string -> composed surface
+        self.cache_size = cache_size
+
+        images = [font.render(char, 0, colour) for char in ATLAS_CHARS]
+        width  = sum(img.get_width() for img in images)
+
+        self.atlas = pygame.Surface((width, self.height))
+        self.atlas.fill(COLOUR_KEY)
+        self.atlas.set_colorkey(COLOUR_KEY)
+
+        x = 0
+        for char, img in zip(ATLAS_CHARS, images):
+            self.atlas.blit(img, (x, 0))
+            self.glyphs[char] = pygame.Rect(x, 0, img.get_width(), self.height)
+            x += img.get_width()
+
+        if pygame.display.get_surface() is not None:
+            self.atlas = self.atlas.convert()
+
+        # characters outside the atlas are drawn as a space
+        self.missing = self.glyphs[' ']
+
+    def measure(self, text):
+
+        glyphs = self.glyphs
+        return sum(glyphs.get(char, self.missing).width for char in text)
+
+    def compose(self, text):
+
+        surface = pygame.Surface((max(1, self.measure(text)), self.height))
+        surface.fill(COLOUR_KEY)
+        surface.set_colorkey(COLOUR_KEY)
+
+        x = 0
+        for char in text:
+            area = self.glyphs.get(char, self.missing)
+            surface.blit(self.atlas, (x, 0), area)
+            x += area.width
+
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        return surface
+
+    def render(self, text):
+
+        surface = self.cache.get(text)
+        if surface is not None:
+            self.cache.move_to_end(text)
+            return surface
+
+        surface = self.compose(text)
+        self.cache[text] = surface
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return surface
+
+    def draw(self, surface, text, pos):
+
+        surface.blit(self.render(text), pos)
+
+#=======================================================================
+# ticker class - a message scrolling right to left through a viewport
+#=======================================================================
+
+class Ticker():
+
+    def __init__(self, atlas, text, width, speed):
+
+        # the viewport holds what is showing. each update scrolls it and
+        # blits in just the glyphs coming in on the right, so nothing the
+        # size of the message is ever rendered
+        self.atlas  = atlas
+        self.width  = width  # of the viewport
+        self.speed  = speed  # pixels per update
+        self.strip  = pygame.Surface((width, atlas.height))
+        if pygame.display.get_surface() is not None:
+            self.strip = self.strip.convert()
+        self.strip.set_colorkey(COLOUR_KEY)
+        self.setText(text)
+
+    def setText(self, text):
+
+        # the areas of the message's glyphs in the atlas and where each
+        # starts along the message, it starts again from the right
+        glyphs = self.atlas.glyphs
+        self.areas  = [glyphs.get(char, self.atlas.missing) for char in text]
+        self.starts = [0]
+        for area in self.areas:
+            self.starts.append(self.starts[-1] + area.width)
+        self.offset = self.width # where the message starts relative to the viewport
+        self.compose(0, self.width)
+
+    def compose(self, left, right):
+
+        # redraws the part of the viewport from left to right, the glyphs
+        # cut by its edges are trimmed to it
+        self.strip.fill(COLOUR_KEY, (left, 0, right - left, self.atlas.height))
+        starts = self.starts
+        offset = self.offset
+        atlas  = self.atlas.atlas
+        blits  = []
+        for i in range(max(0, bisect.bisect_right(starts, left - offset) - 1), len(self.areas)):
+            x = offset + starts[i]
+            if x >= right:
+                break
+            area = self.areas[i]
+            if x < left or x + area.width > right:
+                cut  = max(0, left - x)
+                area = pygame.Rect(area.x + cut, area.y, min(area.width, right - x) - cut, area.height)
+                x += cut
+            if area.width > 0:
+                blits.append((atlas, (x, 0), area))
+        self.strip.blits(blits, doreturn=False)
+
+    def update(self):
+
+        # once the message has gone off the left it comes in again from the right
+        self.offset -= self.speed
+        if self.offset < -self.starts[-1]:
+            self.offset = self.width
+            self.compose(0, self.width)
+        else:
+            self.strip.scroll(-self.speed, 0)
+            self.compose(self.width - self.speed, self.width)
+
+    def draw(self, surface, x, y):
+
+        return surface.blit(self.strip, (x, y))
+
+#=======================================================================
+# atlas cache - one atlas per font, size and colour
+#=======================================================================
+
+atlases = {}
+
+def getAtlas(font_path, size, colour):
+
+    key = (str(font_path), size, tuple(colour))
+    atlas = atlases.get(key)
+    if atlas is None:
+        atlas = atlases[key] = GlyphAtlas(font_path, size, colour)
+    return atlas
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  observations.py
+#
+#  the game state as numbers, for agents and analytics that have no use
+#  for pixels. everything is read straight from the player and the entity
+#  arrays, nothing is drawn, and the features are written into the same
+#  preallocated float32 array every time.
+#
+#  the feature vector is laid out as
+#
+#    player      x, y, vx, vy, gun heat, gun level, lives
+#    enemies     the nearest k, each dx, dy, vx, vy, present
+#    bullets     the nearest k enemy bullets, each dx, dy, vx, vy, present
+#    bombs       the nearest k enemy bombs, each dx, dy, vx, vy, present
+#    tokens      the nearest k, each dx, dy, present
+#    powerups    the nearest k, each dx, dy, present
+#
+#  positions are scaled by the screen size and velocities by VEL_SCALE,
+#  others are relative to the player and sorted nearest first. slots past
+#  the last entity are all zeros, present included.
+#
+#  the optional occupancy grid is a low resolution (channel, row, column)
+#  picture of where things are, each cell set to 1 where an entity's rect
+#  covers any of it.
+#
+import numpy as np
+import shmup1
+
+PLAYER_FEATURES = 7
+MOVER_FEATURES  = 5 # dx, dy, vx, vy, present
+PICKUP_FEATURES = 3 # dx, dy, present
+
+VEL_SCALE = 10.0 # pixels per tick that scales to 1.0
+
+GRID_CHANNELS = ('player', 'enemies', 'enemy_shots', 'pickups')
+
+def featureLayout(enemies = 8, bullets = 16, bombs = 4, tokens = 4, powerups = 1):
+
+    # [(name, slots, features per slot)] in the order they are packed
+    return [('player', 1, PLAYER_FEATURES),
+            ('enemies', enemies, MOVER_FEATURES),
+            ('bullets', bullets, MOVER_FEATURES),
+            ('bombs', bombs, MOVER_FEATURES),
+            ('tokens', tokens, PICKUP_FEATURES),
+            ('powerups', powerups, PICKUP_FEATURES)]
+
+def featureSize(**nearest):
+
+    return sum(slots * size for name, slots, size in featureLayout(**nearest))
+
+def gridShape(grid):
+
+    # grid is (columns, rows)
+    return (len(GRID_CHANNELS), grid[1], grid[0])
+
+#=======================================================================
+# feature observer class
+#=======================================================================
+
+class FeatureObserver():
+
+    def __init__(self, game, grid = None, out = None, grid_out = None, **nearest):
+
+        # out and grid_out let the arrays live somewhere else, such as
+        # shared memory. nearest sets how many of each kind are kept
+        self.game     = game
+        self.layout   = featureLayout(**nearest)
+        self.features = out if out is not None else np.zeros(featureSize(**nearest), np.float32)
+
+        self.grid_size = grid
+        self.grid = None
+        if grid is not None:
+            self.grid = grid_out if grid_out is not None else np.zeros(gridShape(grid), np.float32)
+
+    def nearest(self, items, arrays, px, py, slots, size, values):
+
+        # appends the features of the items nearest the player to values,
+        # nearest first, padded with zeros out to slots. there are only
+        # ever a few dozen so plain python beats numpy's call overhead, and
+        # only the rows of live items are pulled out of the arrays
+        near = []
+        if items:
+            rows = [e.row for e in items]
+            for i, (x, y) in enumerate(arrays.pos.array[rows].tolist()):
+                dx = x - px
+                dy = y - py
+                near.append((dx * dx + dy * dy, dx, dy, i))
+            near.sort()
+            del near[slots:]
+
+        sx = 1.0 / shmup1.SCREEN_WIDTH
+        sy = 1.0 / shmup1.SCREEN_HEIGHT
+        if size == PICKUP_FEATURES:
+            for d, dx, dy, i in near:
+                values += (dx * sx, dy * sy, 1.0)
+        elif near:
+            sv  = 1.0 / VEL_SCALE
+            vel = arrays.vel.array[[rows[i] for d, dx, dy, i in near]].tolist()
+            for (d, dx, dy, i), (vx, vy) in zip(near, vel):
+                values += (dx * sx, dy * sy, vx * sv, vy * sv, 1.0)
+        values += [0.0] * ((slots - len(near)) * size)
+
+    def observe(self):
+
+        game   = self.game
+        player = game.player
+
+        # built as one list and copied into the array in one go
+        px = player.pos.x
+        py = player.pos.y
+        values = [px / shmup1.SCREEN_WIDTH,
+                  py / shmup1.SCREEN_HEIGHT,
+                  player.vel.x / VEL_SCALE,
+                  player.vel.y / VEL_SCALE,
+                  player.gun_heat / player.gun_heat_max,
+                  player.gun_level / player.gun_level_max,
+                  player.lives / 3.0]
+
+        # bullets and bombs share their arrays and live list
+        bullets = []
+        bombs   = []
+        for e in game.enemy_bullets:
+            (bombs if isinstance(e, shmup1.EnemyBomb) else bullets).append(e)
+
+        items = {'enemies'  : (game.enemies, game.enemy_arrays),
+                 'bullets'  : (bullets, game.enemy_bullet_arrays),
+                 'bombs'    : (bombs, game.enemy_bullet_arrays),
+                 'tokens'   : (game.tokens, game.token_arrays),
+                 'powerups' : (game.powerups, game.powerup_arrays)}
+        for name, slots, size in self.layout[1:]:
+            self.nearest(*items[name], px, py, slots, size, values)
+        self.features[:] = values
+
+        if self.grid is not None:
+            self.rasterise()
+        return self.features
+
+    def rasterise(self):
+
+        game  = self.game
+        grid  = self.grid
+        cols  = self.grid_size[0]
+        rows  = self.grid_size[1]
+        sx    = cols / shmup1.SCREEN_WIDTH
+        sy    = rows / shmup1.SCREEN_HEIGHT
+        grid[:] = 0.0
+
+        channels = ([game.player.rect],
+                    [e.rect for e in game.enemies],
+                    [e.rect for e in game.enemy_bullets],
+                    [e.rect for e in game.tokens] + [e.rect for e in game.powerups])
+
+        for channel, rects in zip(grid, channels):
+            for r in rects:
+                x0 = max(0, int(r.left * sx))
+                y0 = max(0, int(r.top * sy))
+                x1 = min(cols, int((r.right - 1) * sx) + 1)
+                y1 = min(rows, int((r.bottom - 1) * sy) + 1)
+                if x0 < x1 and y0 < y1:
+                    channel[y0:y1, x0:x1] = 1.0
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  particles.py
+#
+#  structure of arrays particle engine. every live particle is a row in
+#  a set of contiguous numpy arrays so a whole frame of particles is moved,
+#  faded and culled in a handful of vectorised operations instead of one
+#  python object per particle.
+#
+import numpy as np
+import pygame
+import palettes
+
+# particle alpha is quantised into this many levels so surfaces can be
+# shared between particles of the same colour and size
+ALPHA_LEVELS = 16
+ALPHA_STEP   = 256 // ALPHA_LEVELS
+
+def setAlphaLevel(surface, level):
+
+    # the top level is fully opaque, blitting without surface alpha is far
+    # quicker than blending at 255
+    surface.set_alpha(None if level >= ALPHA_LEVELS else level * ALPHA_STEP)
+
+# particles are given one of these random heights
+PARTICLE_HEIGHTS = (2, 4, 8)
+
+#=======================================================================
+# Particle arrays class - the storage and physics shared by both engines
+#=======================================================================
+
+class ParticleArrays():
+
+    def __init__(self, width, height, fade, capacity = 256):
+
+        self.width    = width
+        self.height   = height
+        self.fade     = fade
+        self.capacity = capacity
+        self.count    = 0
+
+        self.pos   = np.zeros((capacity, 2), np.float64)
+        self.vel   = np.zeros((capacity, 2), np.float64)
+        self.acc   = np.zeros((capacity, 2), np.float64)
+        self.alpha = np.zeros(capacity, np.float64)
+
+    def fieldNames(self):
+
+        # every per particle array, including the ones subclasses add
+        return [name for name, value in vars(self).items() if isinstance(value, np.ndarray)]
+
+    def grow(self, capacity):
+
+        # only called when a burst does not fit, so steady state never allocates
+        for name in self.fieldNames():
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def reserve(self, n):
+
+        # returns the slice the next n particles will occupy
+        if self.count + n > self.capacity:
+            self.grow(max(self.capacity * 2, self.count + n))
+        start = self.count
+        self.count += n
+        return slice(start, self.count)
+
+    def emit(self, x, y, angles_degrees, speeds):
+
+        n = len(angles_degrees)
+        s = self.reserve(n)
+        radians = np.radians(angles_degrees)
+        self.pos[s, 0] = x
+        self.pos[s, 1] = y
+        self.vel[s]    = 0.0
+        self.acc[s, 0] = np.cos(radians) * speeds
+        self.acc[s, 1] = np.sin(radians) * speeds
+        self.alpha[s]  = 255
+        return s
+
+    def killAll(self):
+
+        self.count = 0
+
+    def liveMask(self):
+
+        n = self.count
+        x = self.pos[:n, 0]
+        y = self.pos[:n, 1]
+        return (self.alpha[:n] > 0) & (x >= 0) & (x <= self.width) & (y >= 0) & (y <= self.height)
+
+    def compact(self, keep):
+
+        # move the surviving rows down to the front of every array
+        n = int(np.count_nonzero(keep))
+        if n == self.count:
+            return
+        for name in self.fieldNames():
+            arr = getattr(self, name)
+            arr[:n] = arr[:self.count][keep]
+        self.count = n
+
+    def update(self):
+
+        if self.count == 0:
+            return
+            
+        # cull what died last frame, then move and fade the rest
+        self.compact(self.liveMask())
+        n = self.count
+        self.vel[:n] += self.acc[:n]
+        self.pos[:n] += self.vel[:n]
+        self.alpha[:n] -= self.fade
+        np.maximum(self.alpha[:n], 0, out=self.alpha[:n])
+
+    def isDead(self):
+
+        return self.count == 0
+
+    def positions(self, alpha = 1.0):
+
+        # where to draw the particles alpha of the way from the last tick
+        # to this one. every tick adds the velocity to the position so the
+        # last position is just one velocity back
+        n = self.count
+        if alpha >= 1.0:
+            return self.pos[:n]
+        return self.pos[:n] - self.vel[:n] * (1.0 - alpha)
+
+    def bounds(self, sizes):
+
+        # one rect around every live particle, or None if there are none
+        n = self.count
+        if n == 0:
+            return None
+        pos = self.pos[:n]
+        x0, y0 = pos.min(axis=0)
+        x1, y1 = (pos + sizes).max(axis=0)
+        return pygame.Rect(int(x0), int(y0), int(x1 - x0) + 2, int(y1 - y0) + 2)
+
+
+#=======================================================================
+# Rect particle engine - the coloured streaks of explosions
+#=======================================================================
+
+class RectParticles(ParticleArrays):
+
+    def __init__(self, width, height, capacity = 256):
+
+        super().__init__(width, height, 0.1, capacity)
+        self.size     = np.zeros((capacity, 2), np.int32)
+        self.colour   = np.zeros(capacity, np.int32)
+        self.colours  = []  # colour index -> rgb tuple
+        self.surfaces = {}  # (colour, w, h, alpha level) -> filled surface
+
+    def colourIndex(self, colour):
+
+        if colour not in self.colours:
+            self.colours.append(colour)
+        return self.colours.index(colour)
+
+    def emitRects(self, x, y, angles_degrees, speeds, widths, heights, colour_indexes):
+
+        s = self.emit(x, y, angles_degrees, speeds)
+        self.size[s, 0] = widths
+        self.size[s, 1] = heights
+        self.colour[s]  = colour_indexes
+
+    def getSurface(self, key):
+
+        surface = self.surfaces.get(key)
+        if surface is None:
+            colour, w, h, level = key
+            surface = pygame.Surface((w, h))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            surface.fill(self.colours[colour])
+            setAlphaLevel(surface, level)
+            self.surfaces[key] = surface
+        return surface
+
+    def sprites(self, alpha = 1.0):
+
+        n = self.count
+        if n == 0:
+            return []
+
+        levels = (self.alpha[:n].astype(np.int32) + ALPHA_STEP - 1) // ALPHA_STEP
+        keys   = zip(self.colour[:n].tolist(), self.size[:n, 0].tolist(), self.size[:n, 1].tolist(), levels.tolist())
+        getSurface = self.getSurface
+        surfaces = [getSurface(key) for key in keys]
+        return list(zip(surfaces, self.positions(alpha).tolist()))
+
+
+#=======================================================================
+# Image particle engine - the floating score popups
+#=======================================================================
+
+class ImageParticles(ParticleArrays):
+
+    def __init__(self, width, height, capacity = 32):
+
+        super().__init__(width, height, 0.2, capacity)
+        self.image  = np.zeros(capacity, np.int32)
+        self.images = []  # image index -> surface
+        self.fades  = []  # image index -> a copy of the image at each alpha level
+
+    def bakeFades(self, image):
+
+        # the images are shared with the rest of the game so a popup never
+        # touches their alpha, it draws one of these copies instead
+        fades = [None]
+        for level in range(1, ALPHA_LEVELS + 1):
+            faded = image.copy()
+            setAlphaLevel(faded, level)
+            fades.append(faded)
+        return fades
+
+    def imageIndex(self, image):
+
+        for i, img in enumerate(self.images):
+            if img is image:
+                return i
+        self.images.append(image)
+        self.fades.append(self.bakeFades(image))
+        return len(self.images) - 1
+
+    def emitImages(self, x, y, angles_degrees, speed, image):
+
+        s = self.emit(x, y, angles_degrees, speed)
+        self.image[s] = self.imageIndex(image)
+
+    def sprites(self, alpha = 1.0):
+
+        n = self.count
+        if n == 0:
+            return []
+
+        # level 0 is fully faded out and not drawn
+        levels = (self.alpha[:n].astype(np.int32) + ALPHA_STEP - 1) // ALPHA_STEP
+        fades  = self.fades
+        return [(fades[i][level], pos) for i, level, pos in zip(self.image[:n].tolist(), levels.tolist(), self.positions(alpha).tolist()) if level]
+
+
+#=======================================================================
+# particlesystemController class
+#=======================================================================
+
+class ParticleSystemController():
+
+    def __init__(self, width, height, rng = None):
+
+        self.rng    = rng if rng is not None else np.random.default_rng()
+        self.rects  = RectParticles(width, height)
+        self.scores = ImageParticles(width, height)
+        self.pico8  = np.array([self.rects.colourIndex(c) for c in palettes.PALETTE_PICO8])
+
+    def pickColours(self, n, colour):
+
+        if colour is None:
+            # random pico8 colours excluding black
+            return self.pico8[self.rng.integers(1, 16, n)]
+        return self.rects.colourIndex(colour)
+
+    def spawnBurstDirection(self, x, y, angle, spread, max_particles = 20, colour=None):
+
+        n = max_particles
+        # each particle varies the angle of the one before it a little bit
+        angles  = (angle + np.cumsum(self.rng.uniform(-spread, spread, n))) % 360
+        speeds  = self.rng.uniform(0.05, 2.0, n)
+        widths  = self.rng.integers(4, 65, n)
+        heights = self.rng.choice(PARTICLE_HEIGHTS, n)
+        self.rects.emitRects(x, y, angles, speeds, widths, heights, self.pickColours(n, colour))
+
+    def spawnBurstCircle(self, x, y, max_particles = 20, colour=None):
+
+        n = max_particles
+        angles  = np.arange(n) * (360 // n)
+        speeds  = self.rng.uniform(1.0, 5.0, n)
+        widths  = self.rng.integers(4, 65, n)
+        heights = self.rng.choice(PARTICLE_HEIGHTS, n)
+        self.rects.emitRects(x, y, angles, speeds, widths, heights, self.pickColours(n, colour))
+
+    def spawnScoreBurst(self, x, y, scoreimage):
+
+        angle = self.rng.integers(180, 361)
+        self.scores.emitImages(x, y, np.array([angle]), 0.5, scoreimage)
+
+    def bakeFades(self, images):
+
+        # made at load time so the first popup of each image doesn't stall
+        for image in images:
+            self.scores.imageIndex(image)
+
+    def killAll(self):
+
+        self.rects.killAll()
+        self.scores.killAll()
+
+    def update(self):
+
+        self.rects.update()
+        self.scores.update()
+
+    def sprites(self, alpha = 1.0):
+
+        # the rects go under the score popups
+        return self.rects.sprites(alpha) + self.scores.sprites(alpha)
+
+    def count(self):
+
+        return self.rects.count + self.scores.count
+
+    def bounds(self):
+
+        # rects around everything drawn, for the dirty rect presenter
+        r = []
+        rects = self.rects.bounds(self.rects.size[:self.rects.count])
+        if rects is not None:
+            r.append(rects)
+        n = self.scores.count
+        if n:
+            sizes = [self.scores.images[i].get_size() for i in self.scores.image[:n].tolist()]
+            r.append(self.scores.bounds(np.array(sizes)))
+        return r
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  pools.py
+#
+#  fixed capacity object pools. every pooled object is built up front and
+#  handed out again and again, so spawning a bullet in the middle of a
+#  firefight reuses an old one rather than allocating a new object.
+#
+
+#=======================================================================
+# object pool class
+#=======================================================================
+
+class ObjectPool():
+
+    def __init__(self, factory, capacity):
+
+        self.capacity = capacity
+        self.free     = []
+        self.dropped  = 0 # acquires refused because the pool was empty
+
+        for n in range(capacity):
+            obj = factory()
+            obj.pool = self
+            self.free.append(obj)
+
+    def acquire(self):
+
+        # returns None when every object is in use, the caller then
+        # simply doesn't spawn anything this time
+        if self.free:
+            return self.free.pop()
+        self.dropped += 1
+        return None
+
+    def release(self, obj):
+
+        self.free.append(obj)
+
+    def inUse(self):
+
+        return self.capacity - len(self.free)
+
+#=======================================================================
+# list helpers
+#=======================================================================
+
+def compactInPlace(items):
+
+    # remove the dead from a list without building a new one, handing
+    # pooled objects back to the pool they came from
+    write = 0
+    for item in items:
+        if item.isDead():
+            pool = getattr(item, 'pool', None)
+            if pool is not None:
+                pool.release(item)
+        else:
+            items[write] = item
+            write += 1
+    del items[write:]
+
+def releaseAll(items):
+
+    for item in items:
+        pool = getattr(item, 'pool', None)
+        if pool is not None:
+            pool.release(item)
+    del items[:]
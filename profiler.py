@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  profiler.py
+#
+#  per phase frame timings. the game brackets each phase of a frame with
+#  begin()/end() and the profiler keeps the last N frames of timings in a
+#  ring buffer. NullProfiler is used when nobody is watching so the game
+#  code doesn't need to check whether profiling is on.
+#
+#  ProfilerOverlay draws the ring buffer over the game as a rolling frame
+#  time graph with the per phase timings and entity counts alongside.
+#
+import csv
+import time
+import numpy as np
+import pygame
+import palettes
+import glyphs
+
+#=======================================================================
+# null profiler class - used when profiling is off
+#=======================================================================
+
+class NullProfiler():
+
+    def beginFrame(self):
+
+        pass
+
+    def endFrame(self):
+
+        pass
+
+    def begin(self, phase):
+
+        pass
+
+    def end(self, phase):
+
+        pass
+
+    def count(self, name, value):
+
+        pass
+
+#=======================================================================
+# frame profiler class
+#=======================================================================
+
+class FrameProfiler():
+
+    def __init__(self, frames = 600):
+
+        self.frames      = frames
+        self.phases      = [] # phase names in the order first seen
+        self.columns     = {} # phase name -> column in samples
+        self.samples     = np.zeros((frames, 0)) # seconds per phase per frame
+        self.totals      = np.zeros(frames)      # whole frame seconds
+        self.current     = []
+        self.starts      = {}
+        self.counters    = {} # name -> latest value
+        self.count_names = [] # counter names in the order first seen
+        self.counts      = np.zeros((frames, 0)) # counter value per frame
+        self.frame       = 0  # frames recorded so far
+        self.frame_start = 0.0
+
+    def addPhase(self, phase):
+
+        self.columns[phase] = len(self.phases)
+        self.phases.append(phase)
+        self.current.append(0.0)
+        self.samples = np.hstack((self.samples, np.zeros((self.frames, 1))))
+
+    def beginFrame(self):
+
+        self.frame_start = time.perf_counter()
+
+    def endFrame(self):
+
+        row = self.frame % self.frames
+        self.totals[row]  = time.perf_counter() - self.frame_start
+        self.samples[row] = self.current
+        for i in range(len(self.current)):
+            self.current[i] = 0.0
+        for i, name in enumerate(self.count_names):
+            self.counts[row, i] = self.counters[name]
+        self.frame += 1
+
+    def begin(self, phase):
+
+        self.starts[phase] = time.perf_counter()
+
+    def end(self, phase):
+
+        elapsed = time.perf_counter() - self.starts[phase]
+        if phase not in self.columns:
+            self.addPhase(phase)
+        # a phase may run more than once a frame so add them up
+        self.current[self.columns[phase]] += elapsed
+
+    def count(self, name, value):
+
+        if name not in self.counters:
+            self.count_names.append(name)
+            self.counts = np.hstack((self.counts, np.zeros((self.frames, 1))))
+        self.counters[name] = value
+
+    def recorded(self):
+
+        return min(self.frame, self.frames)
+
+    def order(self):
+
+        # ring buffer rows of the recorded frames, oldest first
+        if self.frame <= self.frames:
+            return np.arange(self.frame)
+        return np.roll(np.arange(self.frames), -(self.frame % self.frames))
+
+    def history(self):
+
+        # returns (totals, samples) for the recorded frames, oldest first
+        order = self.order()
+        return self.totals[order], self.samples[order]
+
+    def lastFrame(self):
+
+        # seconds per phase of the most recent frame
+        if self.frame == 0:
+            return np.zeros(len(self.phases))
+        return self.samples[(self.frame - 1) % self.frames]
+
+    def writeCsv(self, path):
+
+        # one row per recorded frame, times in milliseconds
+        order = self.order()
+        first = self.frame - len(order)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'total_ms'] + [p + '_ms' for p in self.phases] + self.count_names)
+            for n, row in enumerate(order):
+                writer.writerow([first + n, round(self.totals[row] * 1000.0, 4)]
+                                + [round(v * 1000.0, 4) for v in self.samples[row]]
+                                + [int(v) for v in self.counts[row]])
+
+    def phaseHistory(self, phases):
+
+        # summed seconds per frame of the named phases
+        totals, samples = self.history()
+        cols = [self.columns[p] for p in phases if p in self.columns]
+        if not cols:
+            return np.zeros(len(totals))
+        return samples[:, cols].sum(axis=1)
+
+#=======================================================================
+# profiler overlay class
+#=======================================================================
+
+class ProfilerOverlay():
+
+    def __init__(self, prof, font_path, budget_ms, width = 300, graph_height = 80):
+
+        self.prof         = prof
+        self.budget_ms    = budget_ms # frame time the game is aiming for
+        self.width        = width
+        self.graph_height = graph_height
+        self.visible      = False
+        self.text         = glyphs.getAtlas(font_path, 8, palettes.COLOUR_PICO8_WHITE)
+        self.slow_text    = glyphs.getAtlas(font_path, 8, palettes.COLOUR_PICO8_RED)
+        self.lines        = []
+        self.refresh      = 10 # frames between text refreshes so it can be read
+        self.panel        = pygame.Surface((width, 0))
+
+    def toggle(self):
+
+        self.visible = not self.visible
+
+    def textLines(self):
+
+        # (text, is slow) for each phase of the last frame then the counters
+        prof  = self.prof
+        last  = prof.lastFrame()
+        _, samples = prof.history()
+        means = samples.mean(axis=0) if len(samples) else np.zeros(len(prof.phases))
+        slow  = self.budget_ms / 4.0
+
+        lines = [('{:<22}{:>6} {:>6}'.format('phase', 'last', 'mean'), False)]
+        for i, phase in enumerate(prof.phases):
+            ms = last[i] * 1000.0
+            lines.append(('{:<22}{:6.2f} {:6.2f}'.format(phase[:22], ms, means[i] * 1000.0), ms > slow))
+        for name in prof.count_names:
+            lines.append(('{:<22}{:6d}'.format(name[:22], int(prof.counters[name])), False))
+        return lines
+
+    def drawGraph(self, surface, x, y):
+
+        totals, _ = self.prof.history()
+        totals = totals[-self.width:] * 1000.0
+        scale  = self.graph_height / (self.budget_ms * 2.0)
+
+        for n, ms in enumerate(totals.tolist()):
+            h = min(self.graph_height, int(ms * scale))
+            colour = palettes.COLOUR_PICO8_RED if ms > self.budget_ms else palettes.COLOUR_PICO8_GREEN
+            pygame.draw.line(surface, colour, (x + n, y + self.graph_height), (x + n, y + self.graph_height - h))
+
+        # the frame budget sits half way up the graph
+        budget_y = y + self.graph_height // 2
+        pygame.draw.line(surface, palettes.COLOUR_PICO8_YELLOW, (x, budget_y), (x + self.width, budget_y))
+
+    def draw(self, surface):
+
+        # returns the rect drawn into, None when hidden
+        if not self.visible:
+            return None
+
+        if self.prof.frame % self.refresh == 0 or not self.lines:
+            self.lines = self.textLines()
+
+        height = self.graph_height + 8 + len(self.lines) * 10
+        if self.panel.get_height() != height:
+            self.panel = pygame.Surface((self.width, height))
+            self.panel.fill(palettes.COLOUR_PICO8_DARKBLUE)
+            self.panel.set_alpha(200)
+
+        x = surface.get_width() - self.width
+        surface.blit(self.panel, (x, 0))
+        self.drawGraph(surface, x, 0)
+
+        y = self.graph_height + 4
+        for text, slow in self.lines:
+            atlas = self.slow_text if slow else self.text
+            atlas.draw(surface, text, (x + 4, y))
+            y += 10
+        return pygame.Rect(x, 0, self.width, height)
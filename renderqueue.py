@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  renderqueue.py
+#
+#  sprites are pushed into the queue as (surface, position) or (surface,
+#  position, area) tuples, each onto a layer, and the whole frame is drawn
+#  by one blits call per layer in layer order. within a layer sprites are
+#  drawn in the order they were pushed, so a frame comes out exactly as it
+#  would if everything had been blitted as it was pushed.
+#
+
+#=======================================================================
+# render queue class
+#=======================================================================
+
+class RenderQueue():
+
+    def __init__(self, layers):
+
+        # layers are drawn in the order they are named here
+        self.names  = list(layers)
+        self.layers = [[] for name in self.names]
+        self.counts = [0] * len(self.names) # sprites each layer drew last flush
+        self.calls  = 0                     # blits calls the last flush made
+
+    def push(self, layer, surface, dest, area = None):
+
+        if area is None:
+            self.layers[layer].append((surface, dest))
+        else:
+            self.layers[layer].append((surface, dest, area))
+
+    def extend(self, layer, sprites):
+
+        self.layers[layer].extend(sprites)
+
+    def submitted(self):
+
+        return sum(self.counts)
+
+    def flush(self, surface, mark = None):
+
+        # draws and empties every layer. mark is given the rect of every
+        # sprite drawn, only ask for them when they are needed as blits
+        # is quicker when it doesn't have to return them
+        self.calls = 0
+        for n, sprites in enumerate(self.layers):
+            self.counts[n] = len(sprites)
+            if not sprites:
+                continue
+            if mark is None:
+                surface.blits(sprites, doreturn=False)
+            else:
+                for r in surface.blits(sprites):
+                    mark(r)
+            self.calls += 1
+            sprites.clear()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  replay.py
+#
+#  input recording and replay. a session is fully described by its random
+#  seed, its tick rate and the actions the player took on each frame, so
+#  that is all a recording holds. replaying feeds the same actions in on
+#  the same frames to a game built with the same seed and tick rate, which
+#  re-simulates the session bit for bit. the recording also keeps a hash
+#  of the final game state so a replay can check it really did end up in
+#  the same place.
+#
+import struct
+
+REPLAY_MAGIC   = b'SHMUPREC'
+REPLAY_VERSION = 3 # 2 since enemies roll their firing in one batch, 3 since the tick rate is stored
+REPLAY_HEADER  = struct.Struct('<8sIQII32s') # magic, version, seed, sim hz, frames, final state hash
+REPLAY_ENTRY   = struct.Struct('<IB')        # frame, action
+
+#=======================================================================
+# input log class
+#=======================================================================
+
+class InputLog():
+
+    def __init__(self, seed, sim_hz = 50):
+
+        self.seed       = seed
+        self.sim_hz     = sim_hz  # ticks per second, motion is per tick so it changes the game
+        self.frames     = 0       # frames the session ran for
+        self.entries    = []      # (frame, action) in the order they happened
+        self.final_hash = b''
+
+    def record(self, frame, action):
+
+        self.entries.append((frame, action))
+
+    def actionsByFrame(self):
+
+        # frame -> list of actions taken on that frame
+        frames = {}
+        for frame, action in self.entries:
+            frames.setdefault(frame, []).append(action)
+        return frames
+
+    def save(self, path):
+
+        with open(path, 'wb') as f:
+            f.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.sim_hz, self.frames, self.final_hash))
+            for frame, action in self.entries:
+                f.write(REPLAY_ENTRY.pack(frame, action))
+
+def load(path):
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version, seed, sim_hz, frames, final_hash = REPLAY_HEADER.unpack_from(data, 0)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError('not a version {} replay: {}'.format(REPLAY_VERSION, path))
+
+    log = InputLog(seed, sim_hz)
+    log.frames     = frames
+    log.final_hash = final_hash
+    log.entries    = list(REPLAY_ENTRY.iter_unpack(data[REPLAY_HEADER.size:]))
+    return log
@@ -1,10 +1,28 @@
 import pygame
 import math
-import random
+import argparse
 import pathlib
+import random
+import os
+import concurrent.futures
 import palettes
+import particles
+import broadphase
+import pools
+import glyphs
+import profiler
+import dirtyrects
+import assetbundle
+import entities
+import starfield
 from vector import Vector2
 import time
+import hashlib
+import numpy as np
+import replay
+import renderqueue
+import voices
+import textanim
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 800
@@ -14,432 +32,292 @@ GAME_STATE_IN_PROGRESS    = 1
 GAME_STATE_LIFE_LOST      = 2
 GAME_STATE_OVER           = 3
 
+# simulation ticks per second. every speed, cooldown and delay in the game
+# is counted in ticks and tuned for this rate, so it is fixed, only the
+# rate frames are drawn at can change
+SIM_HZ = 50
+
+# ticks the game waits after a life is lost, four seconds
+LIFE_LOST_TICKS = SIM_HZ * 4
+
 FILEPATH = pathlib.Path().cwd()
 
+# text is drawn from glyph atlases built from this font at these sizes
+FONT_SIZE_SMALL = 24
+FONT_SIZE_TITLE = 48
+
 # direction consts for player movement
 D_UP    = 0
 D_DOWN  = 1
 D_LEFT  = 2
 D_RIGHT = 3
 
+# player actions, these are what the input log records each frame
+ACTION_START = 0
+ACTION_FIRE  = 1
+ACTION_UP    = 2
+ACTION_DOWN  = 3
+ACTION_LEFT  = 4
+ACTION_RIGHT = 5
+
+ACTION_KEYS = {
+    pygame.K_SPACE : ACTION_START,
+    pygame.K_z     : ACTION_FIRE,
+    pygame.K_UP    : ACTION_UP,
+    pygame.K_DOWN  : ACTION_DOWN,
+    pygame.K_LEFT  : ACTION_LEFT,
+    pygame.K_RIGHT : ACTION_RIGHT,
+}
+
+# render queue layers, drawn in this order each frame
+LAYER_BACKGROUND     = 0
+LAYER_STARS          = 1
+LAYER_PARTICLES      = 2
+LAYER_PLAYER_BULLETS = 3
+LAYER_ENEMIES        = 4
+LAYER_ENEMY_BULLETS  = 5
+LAYER_TOKENS         = 6
+LAYER_POWERUPS       = 7
+LAYER_PLAYER         = 8
+LAYER_HUD            = 9
+
+RENDER_LAYERS = ('background', 'stars', 'particles', 'player_bullets', 'enemies',
+                 'enemy_bullets', 'tokens', 'powerups', 'player', 'hud')
+
+# mixer channels kept for each kind of sound, so explosions can't crowd
+# out the cues that matter
+VOICE_CATEGORIES = {
+    'player'     : 2,
+    'enemies'    : 2,
+    'explosions' : 3,
+    'cues'       : 2,
+}
+
+# cue name -> (category, priority, cooldown in ticks)
+VOICE_CUES = {
+    'player_death'  : ('cues', 100, 0),
+    'powerup'       : ('cues', 80, 0),
+    'token'         : ('cues', 60, 0),
+    'enemy_dead'    : ('explosions', 50, 2),
+    'gun_overheat'  : ('player', 45, 10),
+    'player_zap'    : ('player', 40, 3),
+    'enemy_bomb'    : ('enemies', 30, 4),
+    'enemy_zap'     : ('enemies', 20, 4),
+    'enemy_spawn'   : ('enemies', 10, 10),
+}
+
 
 # ======================================================================
 # setup pygame
 # ======================================================================
-# set mixer to 512 value to stop buffering causing sound delay
-# this must be called before anything else using mixer.pre_init()
-# setting frequency to 22050 seems to cure the SDL thread dump bug
-# also calling pygame.init() after both mixer inits is recomended
-# to further help remove sound delay problems.
-# https://stackoverflow.com/questions/18273722/pygame-sound-delay/18513365
-# pygame2 apparently does not require the mixer pre init()
-# but keeping it seems to still cure the sdl bug 
-#pygame.mixer.pre_init(22050, -16, 2, 512)
-pygame.mixer.init()
-pygame.init()
-pygame.display.set_caption('Shmup1')
-screen = pygame.display.set_mode([SCREEN_WIDTH, SCREEN_HEIGHT])
-clock = pygame.time.Clock()
-      
-#=======================================================================
-# Score Partical class
-#=======================================================================
+# the display and mixer are only set up by initPygame() so the module can
+# be imported and the simulation stepped without a window or audio device.
+# screen stays None in headless mode and nothing is ever drawn.
+screen = None
+clock  = None
 
-class ScorePartical():
+def initPygame(headless=False):
     
-    def __init__(self, pos, angle, speed, image):
-        
-        self.pos = Vector2(pos.x, pos.y)
-        self.vel = Vector2(0, 0)
-        self.acc = Vector2(0,0)     
-        self.alpha = 255   
-        self.acc.setFromAngle(angle)
-        self.acc.mult(speed)
-        self.image = image
-        self.image.set_alpha(self.alpha)
-        
-    def update(self):
-        
-        self.vel.add(self.acc)
-        self.pos.add(self.vel)
-        self.alpha -= 0.2
-        self.alpha = max(0,self.alpha)
-        self.image.set_alpha(self.alpha)
-
-    def draw(self):
-        
-        screen.blit(self.image, (self.pos.x, self.pos.y))
-        
-    def isOffScreen(self):
-        
-        return (self.pos.x < 0) or (self.pos.x > SCREEN_WIDTH) or (self.pos.y < 0) or (self.pos.y > SCREEN_HEIGHT)
-        
-    def isDead(self):
-        
-        return (self.alpha <= 0) or (self.isOffScreen())
-
-#=======================================================================
-# Partical class
-#=======================================================================
-
-class Partical():
-    
-    def __init__(self, pos, angle, speed, size, colour):
-        
-        self.pos = Vector2(pos.x, pos.y)
-        self.vel = Vector2(0, 0)
-        self.acc = Vector2(0,0)     
-        self.size = size
-        self.alpha = 255   
-        self.acc.setFromAngle(angle)
-        self.acc.mult(speed)
-        self.image = pygame.Surface([self.size, random.choice((2,4,8))]) # particals have random height
-        self.image.fill(colour)
-        self.image.set_alpha(self.alpha)
-        
-    def update(self):
-        
-        self.vel.add(self.acc)
-        self.pos.add(self.vel)
-        self.alpha -= 0.1 
-        self.alpha = max(0,self.alpha)
-        self.image.set_alpha(self.alpha)
-        
-        
-    def draw(self):
-        
-        screen.blit(self.image, (self.pos.x, self.pos.y))
-        
-    def isOffScreen(self):
-        
-        return (self.pos.x < 0) or (self.pos.x > SCREEN_WIDTH) or (self.pos.y < 0) or (self.pos.y > SCREEN_HEIGHT)
-        
-    def isDead(self):
-        
-        return (self.alpha <= 0) or (self.isOffScreen())
-    
-
-#=======================================================================
-# particle system class
-#=======================================================================
-
-class ParticleSystem():
-    
-    def __init__(self, x, y, mx = 40):
-        
-        self.pos = Vector2(x, y)
-        self.particles = []
-        self.max_particles = mx
-        
-    def killAll(self):
-        
-        self.particles = []
-        
-    def burstDirection(self, angle, spread, colour):
-        
-        self.killAll()
-        for n in range(0, self.max_particles):
-            if colour is None:
-                c = palettes.PALETTE_PICO8[random.randint(1, 15)]
-            else:
-                c = colour
-            # vary the angle a little bit
-            angle = (angle + random.uniform(-spread, spread)) % 360
-            speed = random.uniform(0.05, 2.0)
-            size = random.randint(4, 64) # this is width of the partical
-            p = Partical(self.pos, angle, speed, size, c)
-            self.particles.append(p)
-            
-    def burstCircle(self, colour):
-        
-        self.killAll()
-        step = 360 // self.max_particles
-        for n in range(0, self.max_particles):
-            if colour is None:
-                c = palettes.PALETTE_PICO8[random.randint(1, 15)]
-            else:
-                c = colour
-                
-            angle = n * step
-            speed = random.uniform(1.0, 5.0)
-            size = random.randint(4, 64) # this is width of the partical
-            
-            p = Partical(self.pos, angle, speed, size, c)
-            self.particles.append(p)
+    global screen, clock
     
-    def scoreBurst(self, scoreimage):
-        
-        self.killAll()
-        step = 360 // self.max_particles
-        for n in range(0, self.max_particles):
-            if self.max_particles == 1:
-                angle = random.randint(180, 360)
-            else:
-                angle = n * step
-                
-            speed = 0.5
-            p = ScorePartical(self.pos, angle, speed, scoreimage)
-            self.particles.append(p)
-            
-    def update(self):
-        
-        cp = [p for p in self.particles if not p.isDead()]
-        self.particles = cp
-        for p in self.particles:
-            p.update()
-            p.draw()
-        
-    def isDead(self):
-        
-        return len(self.particles) == 0
-        
-
-#=======================================================================
-# particlesystemController class
-#=======================================================================
-
-class ParticleSystemController():
+    if headless:
+        # fonts are still needed to build the screens, but no display or audio
+        pygame.font.init()
+        clock = pygame.time.Clock()
+        return
     
-    def __init__(self):
-        
-        self.systems = []
-        
-    def spawn(self, x, y, mx):
-        
-        system = ParticleSystem(x, y, mx)
-        self.systems.append(system)
-        return system
-        
-    def spawnBurstDirection(self, x, y, angle, spread, max_particles = 20, colour=None):
-        
-        system = self.spawn(x, y, max_particles)
-        system.burstDirection(angle, spread, colour)
-        
-    def spawnBurstCircle(self, x, y, max_particles = 20, colour=None):
-        
-        system = self.spawn(x, y, max_particles)
-        system.burstCircle(colour)
-        
-    def spawnScoreBurst(self, x, y, scoreimage):
-        
-        system = self.spawn(x, y, 1)
-        system.scoreBurst(scoreimage)
-        
-    def killAll(self):
-        
-        self.systems = []
+    # set mixer to 512 value to stop buffering causing sound delay
+    # this must be called before anything else using mixer.pre_init()
+    # setting frequency to 22050 seems to cure the SDL thread dump bug
+    # also calling pygame.init() after both mixer inits is recomended
+    # to further help remove sound delay problems.
+    # https://stackoverflow.com/questions/18273722/pygame-sound-delay/18513365
+    # pygame2 apparently does not require the mixer pre init()
+    # but keeping it seems to still cure the sdl bug 
+    #pygame.mixer.pre_init(22050, -16, 2, 512)
+    pygame.mixer.init()
+    pygame.init()
+    pygame.display.set_caption('Shmup1')
+    screen = pygame.display.set_mode([SCREEN_WIDTH, SCREEN_HEIGHT])
+    clock = pygame.time.Clock()
     
-    def update(self):
-        
-        cp = [ps for ps in self.systems if not ps.isDead()]
-        self.systems = cp
-        for s in self.systems:
-            s.update()       
-
-
-#=======================================================================
-# Star class
-#=======================================================================
-
-class Star():
     
-    def __init__(self, size, img):
-        
-        self.position = Vector2(random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT))
-        self.velocity = Vector2(0.0, 1 + random.random() * 4.1)
-        self.size     = size
-        self.image    = img 
-        self.rect     = self.image.get_rect()                   
-
-    def reset(self):
-        
-        self.position.y = 0
-        self.position.x = random.randint(0, SCREEN_WIDTH)
-        self.velocity.y = 1 + random.random() * 6.1
-        
-    def update(self):
-                
-        self.velocity.y += 0.2
-        self.position.add(self.velocity)
-        self.rect.x = self.position.x
-        self.rect.y = self.position.y
-        
-    def draw(self):
-        
-        screen.blit(self.image, self.rect)
-
-
 #=======================================================================
-# Starfield class
+# Null sound class - stands in for mixer sounds when running headless
 #=======================================================================
 
-class StarField():
+class NullSound():
     
-    def __init__(self):
+    def play(self, *args, **kwargs):
         
-        self.stars = []
-        self.max_stars = 20
-        self.images = []
-        
-        for i in range(4):
-            img = pygame.Surface((i + 1, i + 1))
-            img.fill(palettes.COLOUR_PICO8_BLUE)
-            self.images.append(img)
-        
-        for i in range(0, self.max_stars):
-            size = random.randint(1,4)
-            img  = self.images[size-1]
-            star = Star(size, img)
-            self.stars.append(star)
-            
-    def update(self):
-        
-        for star in self.stars:
-            star.update()
-            
-            if star.position.y > SCREEN_HEIGHT:
-                star.reset()
-                
-    def draw(self):
-        
-        for star in self.stars:
-            star.draw()
-
+        pass
+      
 # ======================================================================
 # Sploder Enemy class
 # ======================================================================
 
-class EnemySploder():
+class EnemySploder(entities.Entity):
     
-    def __init__(self, x, y, score_value, score_image_index, game):
+    def __init__(self, game):
+        
+        entities.Entity.__init__(self, game.enemy_arrays)
+        self.game  = game
+        self.score_value = 0
+        self.score_image_index = 0
+        self.setWalls(32, SCREEN_WIDTH - 72)
+        
+    def spawn(self, x, y, score_value, score_image_index):
         
         speedy = 0.1
         
-        self.pos   = Vector2(x, y)
-        self.vel   = Vector2(random.randrange(-1, 1), 1 + random.random() * speedy)
-        self.rect  = None
-        self.image = None
-        self.dead  = False
-        self.game  = game
+        self.place(x, y, self.game.rng_enemy.randrange(-1, 1), 1 + self.game.rng_enemy.random() * speedy)
         self.score_value = score_value
         self.score_image_index = score_image_index
 
     def setImage(self, img):
     
-        self.image = img
-        self.rect  = self.image.get_rect()
+        self.setFrames([img])
+        self.rect.size = img.get_size()
 
-    def update(self):
-        
-        self.pos.add(self.vel)
-        
-        # bounce off the walls
-        if self.pos.x < 32 or self.pos.x > SCREEN_WIDTH - 72:
-            self.vel.x *= -1
+    def respawn(self):
         
         # don't kill if we go off screen instead put enemy back to top
-        if self.pos.y > SCREEN_HEIGHT or self.pos.x < -50 or self.pos.x > SCREEN_WIDTH:
-            self.pos.x = random.randint(100, SCREEN_WIDTH-100)
-            self.pos.y = -50
-        
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
-        
-        self.fire()
+        self.pos.x = self.game.rng_enemy.randint(100, SCREEN_WIDTH-100)
+        self.pos.y = -50
+        self.settle()
         
     def fire(self):
         
-        if self.isOnscreen:
-            x = random.random()
-            if x > 0.99:
-                vx = -4
-                vy = 7
-                game.enemyFire(self.pos.x + 16, self.pos.y, vx, vy, self)
-
-    def isOnscreen(self):
-        
-        return self.pos.y > 0
-
-    def isDead(self):
-        
-        return self.dead
-        
-    def draw(self):
-        
-        screen.blit(self.image, (self.pos.x, self.pos.y))
+        # updateEnemies has already rolled that it fires this tick
+        vx = -4
+        vy = 7
+        self.game.enemyFire(self.pos.x + 16, self.pos.y, vx, vy, self)
 
 # ======================================================================
 # enemy class
 # ======================================================================
 
-class Enemy():
+class Enemy(entities.Entity):
     
-    def __init__(self, x, y, score_value, score_image_index, game):
+    def __init__(self, game):
+        
+        entities.Entity.__init__(self, game.enemy_arrays)
+        self.game        = game
+        self.score_value = 0
+        self.score_image_index = 0
+        self.setWalls(32, SCREEN_WIDTH - 72)
+        
+    def spawn(self, x, y, score_value, score_image_index):
         
         speedx = 5
         speedy = 0.9
         
-        self.pos         = Vector2(x, y)
-        self.vel         = Vector2(-3 + random.random() * speedx, 3 + random.random() * speedy)
-        self.rect        = None
-        self.image       = None
-        self.dead        = False
-        self.game        = game
+        self.place(x, y, -3 + self.game.rng_enemy.random() * speedx, 3 + self.game.rng_enemy.random() * speedy)
         self.score_value = score_value
         self.score_image_index = score_image_index
 
     def setImage(self, img):
     
-        self.image = img
-        self.rect  = self.image.get_rect()
+        self.setFrames([img])
+        self.rect.size = img.get_size()
 
-    def update(self):
-        
-        self.pos.add(self.vel)
-        
-        # bounce off the walls
-        if self.pos.x < 32 or self.pos.x > SCREEN_WIDTH - 72:
-            self.vel.x *= -1
+    def respawn(self):
         
         # don't kill if we go off screen instead put enemy back to top
-        if self.pos.y > SCREEN_HEIGHT or self.pos.x < -50 or self.pos.x > SCREEN_WIDTH:
-            self.pos.x = random.randint(100, SCREEN_WIDTH-100)
-            self.pos.y = random.randint(-600, -100)
-        
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
+        self.pos.x = self.game.rng_enemy.randint(100, SCREEN_WIDTH-100)
+        self.pos.y = self.game.rng_enemy.randint(-600, -100)
+        self.settle()
         
-        self.fire()
+    def fire(self, shoot, bomb, jitter):
         
-    def fire(self):
+        # updateEnemies has already rolled whether it shoots or bombs this
+        # tick, and the jitter in the bullet's speed
+        bullet_vx = 0
+        bullet_vy = 7 + jitter
         
-        if self.isOnscreen and self.canFire():
-            x = random.random()
-            bullet_vx = 0
-            bullet_vy = 7 + random.random()
+        if shoot:
+            self.game.enemyFire(self.pos.x + 16, self.pos.y, bullet_vx, bullet_vy, self)
             
-            if x > 0.995:
-                game.enemyFire(self.pos.x + 16, self.pos.y, bullet_vx, bullet_vy, self)
-                
-            if x < 0.008 and self.pos.y > 100 and self.pos.y < 200:
-                game.enemyBomb(self.pos.x + 16, self.pos.y)
-                
-    def canFire(self):
-        
-        # don't allow firing at point blank to player
-        return self.pos.y < SCREEN_HEIGHT-60
+        if bomb:
+            self.game.enemyBomb(self.pos.x + 16, self.pos.y)
 
-    def isOnscreen(self):
-        
-        return self.pos.y > 0
+# ======================================================================
+# enemy systems
+# ======================================================================
 
-    def isDead(self):
-        
-        return self.dead
-        
-    def draw(self):
+def enemyOffscreen(x, y):
+    
+    # x and y can be numbers or arrays of them
+    return (y > SCREEN_HEIGHT) | (x < -50) | (x > SCREEN_WIDTH)
+
+def enemyCanFire(y):
+    
+    # don't allow firing at point blank to player
+    return y < SCREEN_HEIGHT-60
+
+def updateEnemies(arrays, enemies, rng, sploders):
+    
+    # movement and bouncing, then the few that went off screen are
+    # respawned in list order, then firing. a handful of enemies is
+    # cheaper one at a time than through numpy
+    if not enemies:
+        return
+    if len(enemies) < entities.EACH_BELOW:
+        updateFewEnemies(arrays, enemies, rng)
+        entities.syncRects(arrays, enemies)
+        return
+    
+    rows = entities.liveRows(enemies)
+    entities.move(arrays, rows)
+    entities.bounceOffWalls(arrays, rows)
+    xy = arrays.pos.array[rows]
+    offscreen = enemyOffscreen(xy[:, 0], xy[:, 1])
+    for i in np.flatnonzero(offscreen).tolist():
+        enemies[i].respawn()
+    y = arrays.pos.array[rows, 1]
+        
+    # one draw per enemy per tick decides whether it shoots or bombs, a
+    # second is the jitter in the speed of its bullet. sploders fire
+    # wherever they are, the others anywhere above point blank range
+    rolls = rng.random((len(rows), 2))
+    roll = rolls[:, 0]
+    sploder = sploders[rows]
+    can_fire = enemyCanFire(y)
+    shoot = (roll > 0.995) & can_fire
+    shoot |= (roll > 0.99) & sploder
+    bomb = (roll < 0.008) & can_fire & (y > 100) & (y < 200) & ~sploder
+    fires = shoot | bomb
+    if fires.any():
+        for i in np.flatnonzero(fires).tolist():
+            if sploder[i]:
+                enemies[i].fire()
+            else:
+                enemies[i].fire(shoot[i], bomb[i], rolls[i, 1])
         
-        screen.blit(self.image, (self.pos.x, self.pos.y))
+    entities.syncRects(arrays, enemies)
+
+def updateFewEnemies(arrays, enemies, rng):
+    
+    # what updateEnemies does, one enemy at a time. the rolls are the same
+    # numbers in the same order, drawn in one go and read as plain floats
+    entities.moveEach(arrays, enemies)
+    pos = arrays.pos.flat
+    for e in enemies:
+        if enemyOffscreen(pos[e.row + e.row], pos[e.row + e.row + 1]):
+            e.respawn()
+    
+    rolls = rng.random(len(enemies) * 2).tolist()
+    for e, roll, jitter in zip(enemies, rolls[0::2], rolls[1::2]):
+        y = pos[e.row + e.row + 1]
+        can_fire = enemyCanFire(y)
+        if isinstance(e, EnemySploder):
+            if roll > 0.99 or (roll > 0.995 and can_fire):
+                e.fire()
+        else:
+            shoot = roll > 0.995 and can_fire
+            bomb = roll < 0.008 and can_fire and 100 < y < 200
+            if shoot or bomb:
+                e.fire(shoot, bomb, jitter)
 
 # ======================================================================
 # player class
@@ -450,6 +328,7 @@ class Player():
     def __init__(self):
         
         self.pos           = Vector2(SCREEN_WIDTH // 2 - 12, SCREEN_HEIGHT - 30)
+        self.prev_pos      = self.pos.getCopy() # position before the last tick, for drawing between ticks
         self.vel           = Vector2(0.0, 0.0)
         self.vel_target    = Vector2(0.0, 0.0)
         self.images        = []
@@ -467,7 +346,9 @@ class Player():
         
         self.lives      = 3
         self.gun_heat   = 0
+        self.gun_level  = 1
         self.pos        = Vector2(SCREEN_WIDTH // 2 - 12, SCREEN_HEIGHT - 30)
+        self.prev_pos   = self.pos.getCopy()
         self.vel        = Vector2(0.0, 0.0)
         self.vel_target = Vector2(0.0, 0.0)
         
@@ -512,6 +393,8 @@ class Player():
     
     def update(self):
         
+        self.prev_pos.set(self.pos)
+        
         # lerp towards full speed
         self.vel.x = self.lerp(self.vel.x, self.vel_target.x, 0.4)
         self.vel.y = self.lerp(self.vel.y, self.vel_target.y, 0.4)
@@ -525,6 +408,13 @@ class Player():
         # cooldown gun each frame
         self.gunCoolDown()
         
+        self.this_frame += 1
+        if self.this_frame > 4:
+            self.this_frame = 0
+            self.image_index += 1
+            if self.image_index > len(self.images)-1:
+                self.image_index = 0
+        
     def move(self, direction):
         
         if direction == D_UP:
@@ -548,138 +438,77 @@ class Player():
         elif self.pos.y < SCREEN_HEIGHT - 200:
             self.pos.y = SCREEN_HEIGHT - 200
 
-    def draw(self):
+    def sprite(self, alpha = 1.0):
         
-        self.this_frame += 1
-        if self.this_frame > 4:
-            self.this_frame = 0
-            self.image_index += 1
-            if self.image_index > len(self.images)-1:
-                self.image_index = 0
-            
-        screen.blit(self.images[self.image_index], (self.pos.x, self.pos.y))
+        # alpha of the way from the last tick's position to this one
+        x = self.prev_pos.x + (self.pos.x - self.prev_pos.x) * alpha
+        y = self.prev_pos.y + (self.pos.y - self.prev_pos.y) * alpha
+        return (self.images[self.image_index], (x, y))
         
         
 # ======================================================================
 # player bullet class
 # ======================================================================
 
-class PlayerBullet():
+class PlayerBullet(entities.Entity):
     
-    def __init__(self, x, y):
-        
-        self.pos   = Vector2(x,y)
-        self.vel   = Vector2(0,-40)
-        self.dead  = False
-        self.image = None
-        self.rect = None
-        
-    def setImage(self, img):
-        
-        self.image = img
-        self.rect = pygame.Rect(0,0,4,40) # hitbox is not full length of image
+    def __init__(self, arrays):
         
-    def isDead(self):
+        entities.Entity.__init__(self, arrays)
+        self.rect.size = (4, 40) # hitbox is not full length of image
+        self.setLimits(-128, math.inf)
         
-        return self.dead or self.pos.y < -128
+    def spawn(self, x, y):
         
-    def update(self):
+        # reinitialise a pooled bullet in place
+        self.place(x, y, 0, -40)
         
-        self.pos.add(self.vel)
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
-        
-    def draw(self):
+    def setImage(self, img):
         
-        screen.blit(self.image, (self.pos.x, self.pos.y))
+        self.setFrames([img])
 
 # ======================================================================
 # enemy bullet class
 # ======================================================================
 
-class EnemyBullet():
+class EnemyBullet(entities.Entity):
     
-    def __init__(self, x, y, vx, vy):
-        
-        self.pos = Vector2(x, y)
-        self.vel = Vector2(vx, vy)
-        self.size = 4
-        
-        self.image = pygame.Surface([self.size, self.size*3])
-        self.image.fill(palettes.COLOUR_PICO8_WHITE)
-        self.rect = self.image.get_rect()
-        self.dead = False
-        
-    def setImage(self, image):
-        
-        self.image = image
-        self.rect = self.image.get_rect()
-        
-    def isDead(self):
+    def __init__(self, arrays):
         
-        return self.dead or self.pos.y > SCREEN_HEIGHT
+        entities.Entity.__init__(self, arrays)
+        self.setLimits(-math.inf, SCREEN_HEIGHT)
         
-    def update(self):
+    def spawn(self, x, y, vx, vy):
         
-        self.pos.add(self.vel)
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
+        self.place(x, y, vx, vy)
         
-    def draw(self):
+    def setImage(self, image):
         
-        screen.blit(self.image, (self.pos.x, self.pos.y))
+        self.setFrames([image])
+        self.rect.size = image.get_size()
         
 # ======================================================================
 # enemy bomb class
 # ======================================================================
 
-class EnemyBomb():
+class EnemyBomb(entities.Entity):
     
-    def __init__(self, x, y, vx, vy):
+    def __init__(self, arrays):
         
-        self.pos = Vector2(x, y)
-        self.vel = Vector2(vx, vy)
-        self.acc = Vector2(0,0.01)
-        self.size = 8
+        entities.Entity.__init__(self, arrays)
+        self.acc.setFromValues(0, 0.01)
+        self.setLimits(-math.inf, SCREEN_HEIGHT)
         
-        self.images = None
-        self.rect  = None
-        self.dead  = False
-        self.anim_frame = 0
-        self.ticks = 0
+    def spawn(self, x, y, vx, vy):
         
-    def setImage(self, image):
+        self.place(x, y, vx, vy)
         
-        self.images = image
-        self.rect = self.images[0].get_rect()
-        self.size = self.images[0].get_width()
-        
-    def isDead(self):
-        
-        return self.dead or self.pos.y > SCREEN_HEIGHT
-        
-    def update(self):
-        
-        self.vel.add(self.acc)
-        self.pos.add(self.vel)
+    def setImage(self, images):
         
-        # bounce off the walls (32 to allow for wall thickness)
-        if self.pos.x < 32 or self.pos.x > SCREEN_WIDTH - self.size - 32:
-            self.vel.x *= -1
-            
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
-        
-        self.ticks += 1
-        if self.ticks > 4:
-            self.anim_frame += 1
-            if self.anim_frame > len(self.images)-1:
-                self.anim_frame = 0
-            self.ticks = 0
-        
-    def draw(self):
-        
-        screen.blit(self.images[self.anim_frame], (self.pos.x, self.pos.y))
+        # bounces off the walls (32 to allow for wall thickness)
+        self.setFrames(images, 4)
+        self.rect.size = images[0].get_size()
+        self.setWalls(32, SCREEN_WIDTH - images[0].get_width() - 32)
      
      
      
@@ -687,93 +516,103 @@ class EnemyBomb():
 # powerup class - adds firepower to player etc.
 # ======================================================================
         
-class PowerUp():
+class PowerUp(entities.Entity):
     
-    def __init__(self, x, y):
+    def __init__(self, arrays):
         
-        self.pos = Vector2(x, y)
-        self.vel = Vector2(0, 2)
-        self.images = []
-        self.rect = None
-        self.dead = False
+        entities.Entity.__init__(self, arrays)
+        self.setLimits(-math.inf, SCREEN_HEIGHT)
         
-    def setImage(self, image):
-        
-        self.images.append(image)
-        self.rect = image.get_rect()
+    def spawn(self, x, y):
         
-    def isDead(self):
-        
-        return self.dead or self.pos.y > SCREEN_HEIGHT
-        
-    def update(self):
+        self.place(x, y, 0, 2)
         
-        self.pos.add(self.vel)
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
-        
-    def draw(self):
+    def setImage(self, image):
         
-        screen.blit(self.images[0], (self.pos.x, self.pos.y))
+        self.setFrames([image])
+        self.rect.size = image.get_size()
 
 # ======================================================================
 # token class - additional scoring opportunities
 # ======================================================================
         
-class Token():
+class Token(entities.Entity):
     
-    def __init__(self, x, y, value):
-        
-        self.pos = Vector2(x, y)
-        self.vel = Vector2(0, 2)
-        self.images = []
-        self.rect = None
-        self.dead = False
-        self.value = value
-        
-    def setImage(self, image):
-        
-        self.images.append(image)
-        self.rect = image.get_rect()
+    def __init__(self, arrays):
         
-    def isDead(self):
+        entities.Entity.__init__(self, arrays)
+        self.value = 0
+        self.setLimits(-math.inf, SCREEN_HEIGHT)
         
-        return self.dead or self.pos.y > SCREEN_HEIGHT
+    def spawn(self, x, y, value):
         
-    def update(self):
-        
-        self.pos.add(self.vel)
-        self.rect.x = self.pos.x
-        self.rect.y = self.pos.y
+        self.place(x, y, 0, 2)
+        self.value = value
         
-    def draw(self):
+    def setImage(self, image):
         
-        screen.blit(self.images[0], (self.pos.x, self.pos.y))
+        self.setFrames([image])
+        self.rect.size = image.get_size()
         
         
+
 class BackgroundScroller():
     
     def __init__(self, game):
         
-        self.scroller_init_offy = -5112
-        self.scroller_curr_offy = -5112
-        self.scroller_image = game.scroller_image
+        self.scroller_image  = game.scroller_image
+        self.scroller_height = self.scroller_image.get_height()
+        self.scroller_strip  = None
+        # start with the bottom of the image filling the screen
+        self.scroller_init_offy = SCREEN_HEIGHT - self.scroller_height
+        self.scroller_curr_offy = self.scroller_init_offy
+        self.scroller_speed     = 8
     
     def update(self):
         
-        pass
-    
-    def draw(self):
-        
-        self.scroller_curr_offy += 8
+        self.scroller_curr_offy += self.scroller_speed
         
-        if self.scroller_curr_offy > 0: 
-            screen.blit(self.scroller_image,(0,self.scroller_init_offy - self.scroller_curr_offy))
-            
+        # wrap by a whole image height so the stitched top carries straight on
         if self.scroller_curr_offy > SCREEN_HEIGHT:
-            self.scroller_curr_offy = self.scroller_init_offy
+            self.scroller_curr_offy -= self.scroller_height
             
-        screen.blit(self.scroller_image,(0,self.scroller_curr_offy))
+    def makeStrip(self):
+        
+        # the faded image composited over the black background once, so
+        # each frame is a plain copy instead of an alpha blend
+        strip = pygame.Surface(self.scroller_image.get_size()).convert()
+        strip.fill(palettes.COLOUR_PICO8_BLACK)
+        strip.blit(self.scroller_image, (0, 0))
+        return strip
+    
+    def sprites(self, alpha = 1.0):
+        
+        if self.scroller_strip is None:
+            self.scroller_strip = self.makeStrip()
+            
+        # alpha of the way from the last tick's offset to this one. the
+        # strip repeats every image height so one that would leave the
+        # bottom of the screen uncovered is moved down a whole height
+        offy = self.scroller_curr_offy
+        if alpha < 1.0:
+            offy = int(round(offy - self.scroller_speed * (1.0 - alpha)))
+            if offy < self.scroller_init_offy:
+                offy += self.scroller_height
+        
+        # the visible window of the strip
+        top = max(0, -offy)
+        bottom = min(self.scroller_height, SCREEN_HEIGHT - offy)
+        sprites = [(self.scroller_strip, (0, offy + top), (0, top, SCREEN_WIDTH, bottom - top))]
+        
+        # once the top of the image is on screen the gap above it is
+        # filled from the bottom of the strip
+        if offy > 0: 
+            sprites.append((self.scroller_strip, (0, 0), (0, self.scroller_height - offy, SCREEN_WIDTH, offy)))
+        return sprites
+    
+    def draw(self, alpha = 1.0):
+        
+        screen.blits(self.sprites(alpha), doreturn=False)
         
         
 # ======================================================================
@@ -785,45 +624,36 @@ class ScreenIntro():
     def __init__(self, game):
         
         self.game         = game
-        self.title        = self.game.font_title.render('SHMUP1', 0,  palettes.COLOUR_PICO8_ORANGE)
+        self.title        = self.game.textAtlas(FONT_SIZE_TITLE, palettes.COLOUR_PICO8_ORANGE).render('SHMUP1')
         self.footer_text  = 'shoot enemies...collect bonus tokens and gun powerups! ... arrow keys to move, Z to fire. spacebar to start game.'
-        self.footer       = self.game.font_small.render(self.footer_text, 0,  palettes.COLOUR_PICO8_LAVENDER)
-        self.footer_xoff  = SCREEN_WIDTH # (SCREEN_WIDTH - self.footer.get_width()) // 2
-        self.footer_width = self.footer.get_width()
+        self.footer       = glyphs.Ticker(self.game.textAtlas(FONT_SIZE_SMALL, palettes.COLOUR_PICO8_LAVENDER), self.footer_text, SCREEN_WIDTH, 3)
         self.title_xoff   = (SCREEN_WIDTH - self.title.get_width()) // 2
         self.subheading   = 'THE RETRO SHOOTER'
         self.letters_xoff = (SCREEN_WIDTH - (len(self.subheading) * 26)) // 2
         self.angle        = 0
+        self.wave_speed   = 0.3
         self.letters      = []
        
+        atlas = self.game.textAtlas(FONT_SIZE_SMALL, palettes.COLOUR_PICO8_RED)
         for char in list(self.subheading):
-            self.letters.append(self.game.font_small.render(char, 0,  palettes.COLOUR_PICO8_RED))
+            self.letters.append(atlas.render(char))
+        self.wave = textanim.WaveText(self.letters, 26, 40, self.wave_speed)
+            
+    def update(self):
         
-    def draw(self):
+        # the wave moves on by wave_speed for every letter drawn
+        self.angle += self.wave_speed * len(self.letters)
         
-        x              = self.letters_xoff
-        wave_phase     = 0
-        wave_phase_step = 360 / len(self.letters)
-        wave_height    = 40
-        wave_speed     = 0.3
-        letter_spacing = 26
-
-        for c in self.letters:
-            
-            y = math.sin(math.radians(self.angle + wave_phase)) * wave_height
-            self.angle += wave_speed
-            wave_phase += wave_phase_step
-            screen.blit(c, (x, 400 + y))
-            x += letter_spacing
-            
-        screen.blit(self.title, (self.title_xoff, y + 150))
+        self.footer.update()
         
+    def draw(self):
         
-        self.footer_xoff -= 3
-        if self.footer_xoff < -self.footer_width:
-            self.footer_xoff = SCREEN_WIDTH
+        # the title bobs with the last letter of the wave
+        self.wave.draw(screen, self.angle, self.letters_xoff, 400)
+        y = self.wave.offset(self.angle, len(self.letters) - 1)
+        screen.blit(self.title, (self.title_xoff, y + 150))
             
-        screen.blit(self.footer, (self.footer_xoff, 740))
+        self.footer.draw(screen, 0, 740)
         
         for i in range(1,4):
             y = math.sin(math.radians(self.angle / 2)) * 40
@@ -846,15 +676,19 @@ class ScreenGameOver():
         self.game_over_letters = []
         self.letter_spacing = 0
 
-        self.game_over_letters   = self.makeLetters(self.game.font_title, 'GAME OVER!', palettes.COLOUR_PICO8_RED)
-        self.final_score_letters = self.makeLetters(self.game.font_title, 'YOU SCORED', palettes.COLOUR_PICO8_YELLOW)
+        self.game_over_letters   = self.makeLetters(self.game.textAtlas(FONT_SIZE_TITLE, palettes.COLOUR_PICO8_RED), 'GAME OVER!')
+        self.final_score_letters = self.makeLetters(self.game.textAtlas(FONT_SIZE_TITLE, palettes.COLOUR_PICO8_YELLOW), 'YOU SCORED')
+        
+        # the letters spread out to 50 pixels apart and stop there
+        self.game_over_text   = textanim.SpreadText(self.game_over_letters, 51)
+        self.final_score_text = textanim.SpreadText(self.final_score_letters, 51)
 
        
-    def makeLetters(self, font, message, colour):
+    def makeLetters(self, atlas, message):
         
         r = []
         for char in list(message):
-            r.append(font.render(char, 0, colour))
+            r.append(atlas.render(char))
             
         return r
             
@@ -864,23 +698,22 @@ class ScreenGameOver():
         
     def setFinalScore(self):
         
-        self.score = self.game.font_title.render(str(self.game.score), 0,  palettes.COLOUR_PICO8_YELLOW)
+        self.score = self.game.textAtlas(FONT_SIZE_TITLE, palettes.COLOUR_PICO8_YELLOW).render(str(self.game.score))
         self.score_offsetx = (SCREEN_WIDTH - self.score.get_width()) // 2
         self.reset()
         
+    def update(self):
+        
+        if self.letter_spacing < 50:
+            self.letter_spacing += 1
+        
     def draw(self):
         
         offset1 = 260 - (self.letter_spacing * 4)
         offset2 = 250 - (self.letter_spacing * 4)
         
-        if self.letter_spacing < 50:
-            self.letter_spacing += 1
-        
-        for x, letter_image in enumerate(self.game_over_letters):
-            screen.blit(letter_image, (offset1 + (x * self.letter_spacing), 100))
-            
-        for x, letter_image in enumerate(self.final_score_letters):
-            screen.blit(letter_image, (offset2 + (x * self.letter_spacing), 300))    
+        self.game_over_text.draw(screen, self.letter_spacing, offset1, 100)
+        self.final_score_text.draw(screen, self.letter_spacing, offset2, 300)
             
         screen.blit(self.score, (self.score_offsetx, 500))
         
@@ -898,27 +731,27 @@ class ScreenLifeLost():
         self.subheading   = 'GOT YOU !!!'
         self.letters_xoff = (SCREEN_WIDTH - (len(self.subheading) * 26)) // 2
         self.angle        = 0
+        self.wave_speed   = 0.8
         self.letters      = []
        
+        atlas = self.game.textAtlas(FONT_SIZE_SMALL, palettes.COLOUR_PICO8_PINK)
         for char in list(self.subheading):
-            self.letters.append(self.game.font_small.render(char, 0,  palettes.COLOUR_PICO8_PINK))
+            self.letters.append(atlas.render(char))
+        self.wave = textanim.WaveText(self.letters, 26, 40, self.wave_speed)
+            
+    def update(self):
+        
+        self.angle += self.wave_speed * len(self.letters)
         
     def draw(self):
         
-        x              = self.letters_xoff
-        wave_phase     = 0
-        wave_phase_step = 360 / len(self.letters)
-        wave_height    = 40
-        wave_speed     = 0.8
-        letter_spacing = 26
-
-        for c in self.letters:
+        self.wave.draw(screen, self.angle, self.letters_xoff, 400)
             
-            y = math.sin(math.radians(self.angle + wave_phase)) * wave_height
-            self.angle += wave_speed
-            wave_phase += wave_phase_step
-            screen.blit(c, (x, 400 + y))
-            x += letter_spacing
+    def rect(self):
+        
+        # the area the wave of letters can cover
+        height = max(c.get_height() for c in self.letters)
+        return pygame.Rect(self.letters_xoff, 360, len(self.letters) * 26, 80 + height)
 
 
             
@@ -935,14 +768,24 @@ class ScreenLifeLost():
 
 class Game():
 
-    def __init__(self):
+    def __init__(self, headless=False, dirty_rects=False, seed=None, stars=20, sim_hz=SIM_HZ, render_hz=None, max_steps=5):
+        
+        # every random draw the game makes comes from a stream seeded from
+        # the session seed, so a session can be re-simulated exactly
+        self.seedStreams(seed)
+        self.frame               = 0 # simulation ticks since the game was created
+        self.input_log           = None # set to a replay.InputLog to record the player's actions
         
+        self.headless            = headless
         self.gamestate           = GAME_STATE_INTRO
         self.gamestate_delay     = 0
-        self.fps                 = 50
-        self.starfield           = StarField()
+        self.fps                 = sim_hz # simulation ticks per second, the game plays faster or slower away from SIM_HZ
+        self.render_hz           = render_hz if render_hz is not None else sim_hz # frames drawn per second, 0 for as many as possible
+        self.max_steps           = max_steps # ticks run per drawn frame before the game gives up catching up
+        self.render_alpha        = 1.0 # how far the frame being drawn is from the last tick to the current one
+        self.starfield           = starfield.StarField(SCREEN_WIDTH, SCREEN_HEIGHT, self.rng_stars, stars)
         self.player              = Player() 
-        self.psc                 = ParticleSystemController()
+        self.psc                 = particles.ParticleSystemController(SCREEN_WIDTH, SCREEN_HEIGHT, np.random.default_rng(self.rng_fx.getrandbits(64)))
         self.enemies             = [] # the live enemies
         self.enemy_images        = [] # the enemy images
         self.enemy_sounds        = [] # the enemy sounds
@@ -952,22 +795,53 @@ class Game():
         self.player_bullets      = [] # live player bullets
         self.powerups            = [] # live powerups
         self.tokens              = [] # live tokens
+        self.enemy_arrays        = entities.EntityArrays(12, bounces=True) # component arrays behind each live list above
+        self.player_bullet_arrays = entities.EntityArrays(64)
+        self.enemy_bullet_arrays = entities.EntityArrays(288, accelerates=True, bounces=True, animates=True) # bullets and bombs share a list
+        self.token_arrays        = entities.EntityArrays(8)
+        self.powerup_arrays      = entities.EntityArrays(4)
+        self.enemy_pool          = pools.ObjectPool(lambda: Enemy(self), 6) # pools the live objects above are drawn from
+        self.enemy_sploder_pool  = pools.ObjectPool(lambda: EnemySploder(self), 6)
+        self.enemy_sploders      = np.zeros(self.enemy_arrays.rows, dtype=bool) # which enemy rows are sploders, pooled so never changes
+        for e in self.enemy_sploder_pool.free:
+            self.enemy_sploders[e.row] = True
+        self.player_bullet_pool  = pools.ObjectPool(lambda: PlayerBullet(self.player_bullet_arrays), 64)
+        self.enemy_bullet_pool   = pools.ObjectPool(lambda: EnemyBullet(self.enemy_bullet_arrays), 256)
+        self.enemy_bomb_pool     = pools.ObjectPool(lambda: EnemyBomb(self.enemy_bullet_arrays), 32)
+        self.token_pool          = pools.ObjectPool(lambda: Token(self.token_arrays), 8)
+        self.powerup_pool        = pools.ObjectPool(lambda: PowerUp(self.powerup_arrays), 4)
+        self.enemy_grid          = broadphase.SpatialGrid() # broadphase grids for the collision passes
+        self.enemy_bullet_grid   = broadphase.SpatialGrid()
+        self.token_grid          = broadphase.SpatialGrid()
+        self.powerup_grid        = broadphase.SpatialGrid()
         self.token_images        = [] # token images
         self.token_sounds        = [] # token sounds
         self.score_images        = [] # score images for partical system
         self.powerup_images      = [] # powerup images
         self.enemy_image_count   = 4  # number of enemy images
-        self.font_small          = None 
-        self.font_title          = None       
+        self.font_path           = None
         self.screen_edge         = None
         self.scroller_image      = None
         self.player_bullet_image = None
         self.player_life_image   = None
+        self.score_text          = None
+        self.score_shadow_text   = None
+        self.assets              = None # the memory mapped asset bundle
+        self.assets_ready        = None # future that completes when the deferred assets are loaded
         self.sound_player_zap    = None
         self.sound_player_death  = None
         self.sound_gun_overheat  = None
         self.sound_enemy_dead    = []
+        self.voices              = voices.NullVoiceManager() if headless else voices.VoiceManager(VOICE_CATEGORIES)
         self.score               = 0
+        self.profiler            = profiler.NullProfiler() # swap in a FrameProfiler to time each phase
+        self.render_queue        = renderqueue.RenderQueue(RENDER_LAYERS)
+        
+        # how each frame is cleared and put on the display
+        if dirty_rects:
+            self.presenter = dirtyrects.DirtyRectPresenter(SCREEN_WIDTH, SCREEN_HEIGHT)
+        else:
+            self.presenter = dirtyrects.FullFramePresenter()
         
         # load the assets once the above are set
         self.loadAssets()
@@ -977,6 +851,57 @@ class Game():
         self.background_scroller = BackgroundScroller(self)
 
 
+    def seedStreams(self, seed):
+        
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), 'little')
+        # recordings store the seed in 64 bits, so any int is folded into
+        # that range before it seeds anything
+        seed                     = seed & 0xFFFFFFFFFFFFFFFF
+        self.seed                = seed
+        self.rng_spawn           = random.Random('{}:spawn'.format(seed)) # enemy, token and powerup spawns
+        self.rng_enemy           = random.Random('{}:enemy'.format(seed)) # enemy movement and firing
+        self.rng_stars           = random.Random('{}:stars'.format(seed)) # the starfield
+        self.rng_fx              = random.Random('{}:fx'.format(seed))    # sounds and particles, never gameplay
+        self.rng_enemy_bulk      = np.random.default_rng(self.rng_enemy.getrandbits(64)) # every enemy's firing rolls at once
+        
+    def reseed(self, seed):
+        
+        # start the random streams over from a new seed without rebuilding
+        # the game, the starfield keeps the layout it was built with. the
+        # tick count starts over too so equal episodes hash the same
+        self.seedStreams(seed)
+        self.frame = 0
+        self.psc.rng = np.random.default_rng(self.rng_fx.getrandbits(64))
+        
+    def doAction(self, action):
+        
+        # everything the player does goes through here so it can be recorded
+        if self.input_log is not None:
+            self.input_log.record(self.frame, action)
+            
+        if action == ACTION_START:
+            self.spaceBarPressed()
+        elif action == ACTION_FIRE:
+            self.fire()
+        elif action == ACTION_UP:
+            self.player.move(D_UP)
+        elif action == ACTION_DOWN:
+            self.player.move(D_DOWN)
+        elif action == ACTION_LEFT:
+            self.player.move(D_LEFT)
+        elif action == ACTION_RIGHT:
+            self.player.move(D_RIGHT)
+            
+    def stateHash(self):
+        
+        # a fingerprint of the game state, equal hashes mean a replay matched
+        state = [self.frame, self.gamestate, self.score, self.player.lives, self.player.gun_level,
+                 self.player.gun_heat, float(self.player.pos.x), float(self.player.pos.y)]
+        for items in (self.enemies, self.enemy_bullets, self.player_bullets, self.tokens, self.powerups):
+            state.append([(float(item.pos.x), float(item.pos.y)) for item in items])
+        return hashlib.sha256(repr(state).encode('utf-8')).digest()
+        
     def spaceBarPressed(self):
         
         if self.gamestate == GAME_STATE_INTRO:
@@ -987,24 +912,25 @@ class Game():
 
     def startGame(self):
         
+        self.waitForAssets()
         self.score          = 0
-        self.enemies        = []
-        self.enemy_bullets  = []
-        self.player_bullets = []
-        self.powerups       = []
-        self.tokens         = []
-        self.psc.killAll() 
+        self.releaseAll()
         self.player.reset()
 
     def resumeAfterLifeLost(self):
         
         self.player.gun_heat  = 0
         self.player.gun_level = 1
-        self.enemies          = []
-        self.enemy_bullets    = []
-        self.player_bullets   = []
-        self.powerups         = []
-        self.tokens           = []
+        self.releaseAll()
+        
+    def releaseAll(self):
+        
+        # the live lists are emptied in place and their objects go back to the pools
+        pools.releaseAll(self.enemies)
+        pools.releaseAll(self.enemy_bullets)
+        pools.releaseAll(self.player_bullets)
+        pools.releaseAll(self.powerups)
+        pools.releaseAll(self.tokens)
         self.psc.killAll() 
 
 
@@ -1012,7 +938,7 @@ class Game():
         
         if isinstance(enemytype, EnemySploder):
             
-            self.enemy_sounds[1].play()
+            self.voices.play('enemy_zap')
             self.addEnemyBullet(x, y, vx,  vy, 1)
             self.addEnemyBullet(x, y, 0,   vy, 2)
             self.addEnemyBullet(x, y, -vx, vy, 3)
@@ -1024,17 +950,21 @@ class Game():
     
     def addEnemyBullet(self, x, y, vx, vy, img_idx):
         
-        eb = EnemyBullet(x, y, vx, vy)
-        eb.setImage(self.enemy_bullet_images[img_idx])
-        self.enemy_bullets.append(eb)
+        eb = self.enemy_bullet_pool.acquire()
+        if eb is not None:
+            eb.spawn(x, y, vx, vy)
+            eb.setImage(self.enemy_bullet_images[img_idx])
+            self.enemy_bullets.append(eb)
         
     def enemyBomb(self, x, y):
 
-        direction = random.choice((-4, 4))
-        bomb = EnemyBomb(x, y, direction, 0)
-        bomb.setImage(self.enemy_bomb_images)
-        self.enemy_bullets.append(bomb)
-        self.enemy_sounds[2].play()
+        direction = self.rng_enemy.choice((-4, 4))
+        bomb = self.enemy_bomb_pool.acquire()
+        if bomb is not None:
+            bomb.spawn(x, y, direction, 0)
+            bomb.setImage(self.enemy_bomb_images)
+            self.enemy_bullets.append(bomb)
+            self.voices.play('enemy_bomb')
         
         
     def fire(self):
@@ -1054,31 +984,35 @@ class Game():
                 xpositions = (centrex-16, centrex, centrex + 16)
                 
             for x in xpositions:
-                b = PlayerBullet(x, self.player.pos.y - 10)
-                b.setImage(self.player_bullet_image)
-                self.player_bullets.append(b)
+                b = self.player_bullet_pool.acquire()
+                if b is not None:
+                    b.spawn(x, self.player.pos.y - 10)
+                    b.setImage(self.player_bullet_image)
+                    self.player_bullets.append(b)
     
             self.player.fire()
-            self.sound_player_zap.play()
+            self.voices.play('player_zap')
         else:
-            self.sound_gun_overheat.play()
+            self.voices.play('gun_overheat')
         
         
     def spawnEnemy(self):
         
         if len(self.enemies) < 6:
-            x = random.random()
+            x = self.rng_spawn.random()
             
             if x < 0.9:
-                score_image_index = random.randint(0, self.enemy_image_count-2) # excludes sploder image
+                score_image_index = self.rng_spawn.randint(0, self.enemy_image_count-2) # excludes sploder image
                 score_value       = 10 + (score_image_index * 10) # score now matches the partical score image
-                e = Enemy(random.randint(100,SCREEN_WIDTH-100), random.randint(-600, -100), score_value, score_image_index, self)
+                e = self.enemy_pool.acquire()
+                e.spawn(self.rng_spawn.randint(100,SCREEN_WIDTH-100), self.rng_spawn.randint(-600, -100), score_value, score_image_index)
                 e.setImage(self.enemy_images[score_image_index]) 
             else:
-                self.enemy_sounds[0].play()
+                self.voices.play('enemy_spawn')
                 score_image_index = 3
                 score_value = 40
-                e = EnemySploder(random.randint(100,SCREEN_WIDTH-100), -50, score_value, score_image_index, self)
+                e = self.enemy_sploder_pool.acquire()
+                e.spawn(self.rng_spawn.randint(100,SCREEN_WIDTH-100), -50, score_value, score_image_index)
                 e.setImage(self.enemy_images[self.enemy_image_count-1]) 
                 
             self.enemies.append(e)
@@ -1087,19 +1021,21 @@ class Game():
     def spawnPowerUp(self):
 
         if len(self.powerups) < 1 and not self.player.gunIsMax():
-            if random.random() > 0.99:
-                p = PowerUp(random.randint(100, SCREEN_WIDTH-100), 0)
-                p.setImage(self.powerup_images[0]) 
-                self.powerups.append(p)
+            if self.rng_spawn.random() > 0.99:
+                p = self.powerup_pool.acquire()
+                if p is not None:
+                    p.spawn(self.rng_spawn.randint(100, SCREEN_WIDTH-100), 0)
+                    p.setImage(self.powerup_images[0]) 
+                    self.powerups.append(p)
         
     def spawnToken(self):
         
         if len(self.tokens) < 4:
-            if random.random() > 0.9:
+            if self.rng_spawn.random() > 0.9:
                 
                 # try pick a free random spawn position but if it is already in use by a token
                 # don't waste time choosing another just don't spawn anything this frame
-                spawnposition = random.choice((100,200,300,400,500))
+                spawnposition = self.rng_spawn.choice((100,200,300,400,500))
                 position_is_unused = True
                 
                 for t in self.tokens:
@@ -1109,172 +1045,214 @@ class Game():
                         
                 if position_is_unused:
                     token_value = 100
-                    token_type = random.randint(0, len(self.token_images)-2)
-                    t = Token(spawnposition, 0, token_value)
-                    t.setImage(self.token_images[token_type]) 
-                    self.tokens.append(t)
+                    token_type = self.rng_spawn.randint(0, len(self.token_images)-2)
+                    t = self.token_pool.acquire()
+                    if t is not None:
+                        t.spawn(spawnposition, 0, token_value)
+                        t.setImage(self.token_images[token_type]) 
+                        self.tokens.append(t)
+        
+        
+    def loadImage(self, filename):
+        
+        # images are subsurfaces of the atlas in the asset bundle
+        return self.assets.image(filename)
+        
+    def loadFrames(self, filename):
+        
+        # the frames of a sprite sheet, sliced when the bundle was built
+        return self.assets.frames(filename)
+        
+    def loadSound(self, filename):
         
+        if self.headless:
+            return NullSound()
+        return self.assets.sound(filename)
+        
+    def textAtlas(self, size, colour):
+        
+        return glyphs.getAtlas(self.font_path, size, colour)
         
     def loadAssets(self):
         
-        self.scroller_image = pygame.image.load(str(FILEPATH.joinpath('png' ,'c64_screen.png'))).convert()
+        # only what the intro screen needs is loaded before the first frame,
+        # everything else loads on a worker thread while the intro animates
+        self.loadCriticalAssets()
+        
+        if self.headless:
+            self.loadDeferredAssets()
+            self.assets_ready = concurrent.futures.Future()
+            self.assets_ready.set_result(None)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='assets')
+            self.assets_ready = executor.submit(self.loadDeferredAssets)
+            executor.shutdown(wait=False)
+            
+    def waitForAssets(self):
+        
+        # blocks only if the deferred assets are still loading, and
+        # re-raises anything that went wrong on the worker thread
+        self.assets_ready.result()
+        
+    def loadCriticalAssets(self):
+        
+        # surfaces can only be converted to the display format once
+        # a display exists, so headless games keep the bundle's pixels
+        self.assets = assetbundle.openBundle(convert=not self.headless)
+        
+        self.scroller_image = self.loadImage('c64_screen.png')
         self.scroller_image.set_alpha(50)
+
+        # load font, text is rendered on this thread only as freetype
+        # isn't safe to use from two threads at once
+        self.font_path = str(FILEPATH.joinpath('assets' ,'PressStart2P.ttf'))
+        self.score_shadow_text = self.textAtlas(FONT_SIZE_SMALL, palettes.COLOUR_PICO8_RED)
+        self.score_text        = self.textAtlas(FONT_SIZE_SMALL, palettes.COLOUR_PICO8_YELLOW)
+        
+        # load enemy images
+        # the bundle hands out sprites already colour keyed where they need it
+        for img in self.loadFrames('enemies.png')[:self.enemy_image_count]:
+            self.enemy_images.append(img)
+            
+        # load edge tile and make edge surfaces
+        tile = self.loadImage('edge.png')
+        self.screen_edge = pygame.Surface((32, SCREEN_HEIGHT))
+        for i in range(SCREEN_HEIGHT // 32):
+            self.screen_edge.blit(tile, (0, i*32))
         
-        self.player_life_image = pygame.image.load(str(FILEPATH.joinpath('png' ,'heart.png'))).convert()
+    def loadDeferredAssets(self):
         
-        # load token images
-        self.token_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'token_1.png'))).convert())
-        self.token_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'token_2.png'))).convert())
+        self.player_life_image = self.loadImage('heart.png')
         
-        for img in self.token_images:
-            img.set_colorkey(palettes.COLOUR_PICO8_BLACK)
+        # load token images
+        self.token_images.append(self.loadImage('token_1.png'))
+        self.token_images.append(self.loadImage('token_2.png'))
             
         # load powerup images
-        self.powerup_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'powerup_1.png'))).convert())
-        self.powerup_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'powerup_small.png'))).convert())
-        self.powerup_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'powerup_large.png'))).convert())
-        
-        for img in self.powerup_images:
-            img.set_colorkey(palettes.COLOUR_PICO8_BLACK)
+        self.powerup_images.append(self.loadImage('powerup_1.png'))
+        self.powerup_images.append(self.loadImage('powerup_small.png'))
+        self.powerup_images.append(self.loadImage('powerup_large.png'))
         
         # load score images
-        self.score_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'score_10.png'))).convert())
-        self.score_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'score_20.png'))).convert())
-        self.score_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'score_30.png'))).convert())
-        self.score_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'score_40.png'))).convert())
-        self.score_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'score_100.png'))).convert())
+        self.score_images.append(self.loadImage('score_10.png'))
+        self.score_images.append(self.loadImage('score_20.png'))
+        self.score_images.append(self.loadImage('score_30.png'))
+        self.score_images.append(self.loadImage('score_40.png'))
+        self.score_images.append(self.loadImage('score_100.png'))
+        
+        # the score popups fade out, bake their faded copies now
+        self.psc.bakeFades(self.score_images + self.powerup_images)
         
         # load player sounds
-        self.sound_player_zap   = pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'player_zap.ogg')))
-        self.sound_player_death = pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'player_death.ogg')))
-        self.sound_gun_overheat = pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'player_gun_overheat.ogg')))
+        self.sound_player_zap   = self.loadSound('player_zap.ogg')
+        self.sound_player_death = self.loadSound('player_death.ogg')
+        self.sound_gun_overheat = self.loadSound('player_gun_overheat.ogg')
         
         # load enemy bullet images
-        self.enemy_bullet_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'enemy_bullet_1.png'))).convert())
-        self.enemy_bullet_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'enemy_bullet_2.png'))).convert())
-        self.enemy_bullet_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'enemy_bullet_3.png'))).convert())
-        self.enemy_bullet_images.append(pygame.image.load(str(FILEPATH.joinpath('png' ,'enemy_bullet_4.png'))).convert())
+        self.enemy_bullet_images.append(self.loadImage('enemy_bullet_1.png'))
+        self.enemy_bullet_images.append(self.loadImage('enemy_bullet_2.png'))
+        self.enemy_bullet_images.append(self.loadImage('enemy_bullet_3.png'))
+        self.enemy_bullet_images.append(self.loadImage('enemy_bullet_4.png'))
 
         # load enemy bomb images        
-        bombsheet = pygame.image.load(str(FILEPATH.joinpath('png' ,'enemy_bomb.png'))).convert()
-        bombsheet.set_colorkey(palettes.COLOUR_PICO8_BLACK)
-            
-        offsetx        = 0
-        sprite_width   = 12
-        sprite_height  = 12
-        sprite_spacing = 4
-        
-        for n in range(4):
-            tup = (offsetx, 0, sprite_width, sprite_height)
-            img = bombsheet.subsurface(tup)
+        for img in self.loadFrames('enemy_bomb.png'):
             self.enemy_bomb_images.append(img)
-            offsetx += sprite_width + sprite_spacing     
         
         # load enemy explosion sounds
-        self.sound_enemy_dead.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_dead_1.ogg'))))
-        self.sound_enemy_dead.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_dead_2.ogg'))))
-        self.sound_enemy_dead.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_dead_3.ogg'))))
-        self.sound_enemy_dead.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_dead_4.ogg'))))
+        self.sound_enemy_dead.append(self.loadSound('enemy_dead_1.ogg'))
+        self.sound_enemy_dead.append(self.loadSound('enemy_dead_2.ogg'))
+        self.sound_enemy_dead.append(self.loadSound('enemy_dead_3.ogg'))
+        self.sound_enemy_dead.append(self.loadSound('enemy_dead_4.ogg'))
         
         # load enemy spawn and shoot sounds
-        self.enemy_sounds.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_spawn_1.ogg'))))
-        self.enemy_sounds.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_zap_1.ogg'))))
-        self.enemy_sounds.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'enemy_bomb_1.ogg'))))
+        self.enemy_sounds.append(self.loadSound('enemy_spawn_1.ogg'))
+        self.enemy_sounds.append(self.loadSound('enemy_zap_1.ogg'))
+        self.enemy_sounds.append(self.loadSound('enemy_bomb_1.ogg'))
          
         # load token sounds
-        self.token_sounds.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'token_1.ogg'))))
-        self.token_sounds.append(pygame.mixer.Sound(str(FILEPATH.joinpath('sounds' ,'powerup_1.ogg'))))
-        
-        
-        self.player_bullet_image = pygame.image.load(str(FILEPATH.joinpath('png' ,'player_bullet_2.png'))).convert()
-
-        # load font
-        self.font_small = pygame.font.Font(str(FILEPATH.joinpath('assets' ,'PressStart2P.ttf')), 24)
-        self.font_title = pygame.font.Font(str(FILEPATH.joinpath('assets' ,'PressStart2P.ttf')), 48)
-        
-        
-        # load enemy images
-        sheet = pygame.image.load(str(FILEPATH.joinpath('png' ,'enemies.png'))).convert()
-        sheet.set_colorkey(palettes.COLOUR_PICO8_BLACK)
-            
-        offsetx        = 0
-        sprite_width   = 40
-        sprite_height  = 32
-        sprite_spacing = 10
-        
-        for n in range(self.enemy_image_count):
-            tup = (offsetx, 0, sprite_width, sprite_height)
-            img = sheet.subsurface(tup)
-            self.enemy_images.append(img)
-            offsetx += sprite_width + sprite_spacing
+        self.token_sounds.append(self.loadSound('token_1.ogg'))
+        self.token_sounds.append(self.loadSound('powerup_1.ogg'))
+        
+        # every sound is played through the voice manager
+        sounds = {
+            'player_death' : self.sound_player_death,
+            'powerup'      : self.token_sounds[1],
+            'token'        : self.token_sounds[0],
+            'enemy_dead'   : self.sound_enemy_dead,
+            'gun_overheat' : self.sound_gun_overheat,
+            'player_zap'   : self.sound_player_zap,
+            'enemy_bomb'   : self.enemy_sounds[2],
+            'enemy_zap'    : self.enemy_sounds[1],
+            'enemy_spawn'  : self.enemy_sounds[0],
+        }
+        for name, (category, priority, cooldown) in VOICE_CUES.items():
+            self.voices.add(name, sounds[name], category, priority, cooldown)
+        
+        
+        self.player_bullet_image = self.loadImage('player_bullet_2.png')
             
         # load player images        
-        sheet = pygame.image.load(str(FILEPATH.joinpath('png' ,'player_sheet.png'))).convert()
-        sheet.set_colorkey(palettes.COLOUR_PICO8_BLACK)
-            
-        offsetx        = 0
-        sprite_width   = 28
-        sprite_height  = 28
-        sprite_spacing = 4
-        
-        for n in range(3):
-            tup = (offsetx, 0, sprite_width, sprite_height)
-            img = sheet.subsurface(tup)
+        for img in self.loadFrames('player_sheet.png'):
             self.player.setImage(img)
-            offsetx += sprite_width + sprite_spacing        
-        
-        # load edge tile and make edge surfaces
-        tile = pygame.image.load(str(FILEPATH.joinpath('png' ,'edge.png'))).convert()
-        self.screen_edge = pygame.Surface((32, SCREEN_HEIGHT))
-        for i in range(SCREEN_HEIGHT // 32):
-            self.screen_edge.blit(tile, (0, i*32))
 
 
     def collideBulletsWithEnemies(self):
         
          for bullet in self.player_bullets:
-            for enemy in self.enemies:
+            # bullets move further each frame than an enemy is tall so
+            # test the whole path the bullet took since last frame
+            swept = broadphase.sweptRect(bullet.rect, bullet.vel)
+            for enemy in self.enemy_grid.query(swept):
                 # player ship fires dual shots, test to see if 1 shot
                 # has already killed the enemy to prevent double scoring bug
-                if not enemy.dead and bullet.rect.colliderect(enemy.rect):
+                if not enemy.dead and swept.colliderect(enemy.rect):
                     bullet.dead = True
                     enemy.dead = True
                     self.psc.spawnBurstCircle(enemy.pos.x, enemy.pos.y, 10)
                     self.psc.spawnScoreBurst(enemy.pos.x, enemy.pos.y, self.score_images[enemy.score_image_index]) 
-                    self.sound_enemy_dead[random.randint(0,3)].play()
+                    self.voices.play('enemy_dead', self.rng_fx.randint(0,3))
                     self.score += enemy.score_value       
         
     def collideBulletsWithPlayer(self):
         
-         for bullet in self.enemy_bullets:
-            if bullet.rect.colliderect(self.player.rect):
+         for bullet in self.enemy_bullet_grid.query(self.player.rect):
+            if broadphase.sweptRect(bullet.rect, bullet.vel).colliderect(self.player.rect):
                 bullet.dead = True
                 self.psc.spawnBurstDirection(self.player.rect.x, self.player.rect.y, 270, 5, 60)
-                self.sound_enemy_dead[random.randint(0,3)].play()
+                self.voices.play('enemy_dead', self.rng_fx.randint(0,3))
                 self.player.lostLife()
-                self.sound_player_death.play()
+                self.voices.play('player_death')
                 self.gamestate = GAME_STATE_LIFE_LOST       
 
     def collidePlayerWithTokens(self):
         
-        for token in self.tokens:
+        for token in self.token_grid.query(self.player.rect):
             if self.player.rect.colliderect(token.rect):
                 token.dead = True
                 self.score += token.value
-                self.token_sounds[0].play()
+                self.voices.play('token')
                 self.psc.spawnScoreBurst(token.rect.x, token.rect.y, self.score_images[4])
         
     def collidePlayerWithPowerups(self):
         
-        for powerup in self.powerups:
+        for powerup in self.powerup_grid.query(self.player.rect):
             if self.player.rect.colliderect(powerup.rect):
                 powerup.dead = True
                 self.player.addGunLevel()
-                self.token_sounds[1].play()
+                self.voices.play('powerup')
                 self.psc.spawnScoreBurst(powerup.rect.x, powerup.rect.y, self.powerup_images[self.player.gun_level-1])
                 
+    def syncGrids(self):
+        
+        # the grids only re-bucket objects that crossed into a new cell
+        self.enemy_grid.sync(self.enemies)
+        self.enemy_bullet_grid.sync(self.enemy_bullets, lambda b: broadphase.sweptRect(b.rect, b.vel))
+        self.token_grid.sync(self.tokens)
+        self.powerup_grid.sync(self.powerups)
+                
     def doCollisions(self):
         
+        self.syncGrids()
         self.collideBulletsWithEnemies()
         self.collideBulletsWithPlayer()
         self.collidePlayerWithTokens()
@@ -1282,35 +1260,45 @@ class Game():
 
     def clearTheDead(self):
         
-        # clear out any dead objects
-        tmp = [e for e in self.enemies if not e.isDead()]
-        self.enemies = tmp
-        
-        tmp = [b for b in self.enemy_bullets if not b.isDead()]
-        self.enemy_bullets = tmp
-        
-        tmp = [b for b in self.player_bullets if not b.isDead()]
-        self.player_bullets = tmp
-        
-        tmp = [token for token in self.tokens if not token.isDead()]
-        self.tokens = tmp
-
-        tmp = [powerup for powerup in self.powerups if not powerup.isDead()]
-        self.powerups = tmp
+        # cull anything that has left the screen then clear out any dead
+        # objects, compacting the lists in place
+        entities.cull(self.enemy_bullet_arrays, self.enemy_bullets)
+        entities.cull(self.player_bullet_arrays, self.player_bullets)
+        entities.cull(self.token_arrays, self.tokens)
+        entities.cull(self.powerup_arrays, self.powerups)
+        pools.compactInPlace(self.enemies)
+        pools.compactInPlace(self.enemy_bullets)
+        pools.compactInPlace(self.player_bullets)
+        pools.compactInPlace(self.tokens)
+        pools.compactInPlace(self.powerups)
     
-    def drawArena(self):
+    def queueArena(self):
         
-        screen.blit(self.screen_edge, (0,0))
-        screen.blit(self.screen_edge, (SCREEN_WIDTH-32,0))
+        # the edges never change, only the score, lives and heat bar along
+        # the top. the edges are marked too as life lost doesn't redraw the
+        # whole screen, it starts from a black one
+        self.presenter.add(pygame.Rect(0, 0, SCREEN_WIDTH, 40))
+        self.presenter.add(pygame.Rect(0, 0, 32, SCREEN_HEIGHT))
+        self.presenter.add(pygame.Rect(SCREEN_WIDTH-32, 0, 32, SCREEN_HEIGHT))
+        
+        queue = self.render_queue
+        queue.push(LAYER_HUD, self.screen_edge, (0,0))
+        queue.push(LAYER_HUD, self.screen_edge, (SCREEN_WIDTH-32,0))
         
         # draw score
-        screen.blit(self.font_small.render(str(self.score), 0,  palettes.COLOUR_PICO8_RED), (202, 12))
-        screen.blit(self.font_small.render(str(self.score), 0,  palettes.COLOUR_PICO8_YELLOW), (200, 10))
+        # the atlases keep the rendered score until it changes
+        score = str(self.score)
+        queue.push(LAYER_HUD, self.score_shadow_text.render(score), (202, 12))
+        queue.push(LAYER_HUD, self.score_text.render(score), (200, 10))
         
         # draw lives remaining
         for i in range(self.player.lives):
-            screen.blit(self.player_life_image, [40 + (i * 36), 10, 8, 8])
+            queue.push(LAYER_HUD, self.player_life_image, (40 + (i * 36), 10))
+        
+    def drawArena(self):
         
+        # the heat bar is filled rects, drawn straight after the queue is
+        # flushed as it sits on top of everything else
         # this bar really needs to be an object
         if self.player.gunOverHeated():
             pygame.draw.rect(screen, palettes.COLOUR_PICO8_ORANGE, [396, 12, 108, 16])
@@ -1318,68 +1306,145 @@ class Game():
         pygame.draw.rect(screen, palettes.COLOUR_PICO8_LIGHTPEACH, [400, 16, 100, 8])
         pygame.draw.rect(screen, palettes.COLOUR_PICO8_RED       , [400, 16, self.player.gun_heat, 8])        
         
-    def drawGame(self):
+    def updateGame(self):
+        
+        prof = self.profiler
         
+        prof.begin('doCollisions')
         self.doCollisions()
-        self.clearTheDead()
+        prof.end('doCollisions')
         
-        # draw back scroller
-        self.background_scroller.draw()
+        prof.begin('clearTheDead')
+        self.clearTheDead()
+        prof.end('clearTheDead')
         
+        prof.begin('update.background')
+        self.background_scroller.update()
         self.starfield.update()
-        self.starfield.draw()
+        prof.end('update.background')
         
+        prof.begin('psc.update')
         self.psc.update()
+        prof.end('psc.update')
 
-        for b in self.player_bullets:
-            b.update()
-            b.draw()
+        prof.begin('update.player_bullets')
+        entities.update(self.player_bullet_arrays, self.player_bullets)
+        prof.end('update.player_bullets')
 
-        for e in self.enemies:
-            e.update()
-            e.draw()
+        prof.begin('update.enemies')
+        updateEnemies(self.enemy_arrays, self.enemies, self.rng_enemy_bulk, self.enemy_sploders)
+        prof.end('update.enemies')
             
-        for b in self.enemy_bullets:
-            b.update()
-            b.draw()
+        prof.begin('update.enemy_bullets')
+        entities.update(self.enemy_bullet_arrays, self.enemy_bullets)
+        prof.end('update.enemy_bullets')
             
-        for t in self.tokens:
-            t.update()
-            t.draw()
+        prof.begin('update.tokens')
+        entities.update(self.token_arrays, self.tokens)
+        prof.end('update.tokens')
             
-        for p in self.powerups:
-            p.update()
-            p.draw()
+        prof.begin('update.powerups')
+        entities.update(self.powerup_arrays, self.powerups)
+        prof.end('update.powerups')
             
+        prof.begin('update.player')
         self.player.update()
-        self.player.draw()
-        self.drawArena()
+        prof.end('update.player')
     
+        prof.begin('spawn')
         self.spawnEnemy()
         self.spawnToken()
         self.spawnPowerUp()
+        prof.end('spawn')
+        
+    def drawGame(self):
+        
+        prof = self.profiler
+        queue = self.render_queue
+        alpha = self.render_alpha
+        
+        # everything is queued by layer then drawn in one blits call per
+        # layer, the rects drawn into only come back for the dirty rect
+        # presenter when it can use them
+        mark = self.presenter.add
+        
+        # queue back scroller, it moves every frame so the whole screen changes
+        prof.begin('draw.background')
+        queue.extend(LAYER_BACKGROUND, self.background_scroller.sprites(alpha))
+        self.presenter.invalidateAll()
+        queue.extend(LAYER_STARS, self.starfield.sprites(alpha))
+        prof.end('draw.background')
+        
+        prof.begin('draw.particles')
+        queue.extend(LAYER_PARTICLES, self.psc.sprites(alpha))
+        for r in self.psc.bounds():
+            mark(r)
+        prof.end('draw.particles')
+
+        prof.begin('draw.player_bullets')
+        queue.extend(LAYER_PLAYER_BULLETS, entities.sprites(self.player_bullet_arrays, self.player_bullets, alpha))
+        prof.end('draw.player_bullets')
+
+        prof.begin('draw.enemies')
+        queue.extend(LAYER_ENEMIES, entities.sprites(self.enemy_arrays, self.enemies, alpha))
+        prof.end('draw.enemies')
+            
+        prof.begin('draw.enemy_bullets')
+        queue.extend(LAYER_ENEMY_BULLETS, entities.sprites(self.enemy_bullet_arrays, self.enemy_bullets, alpha))
+        prof.end('draw.enemy_bullets')
+            
+        prof.begin('draw.tokens')
+        queue.extend(LAYER_TOKENS, entities.sprites(self.token_arrays, self.tokens, alpha))
+        prof.end('draw.tokens')
+            
+        prof.begin('draw.powerups')
+        queue.extend(LAYER_POWERUPS, entities.sprites(self.powerup_arrays, self.powerups, alpha))
+        prof.end('draw.powerups')
+            
+        prof.begin('draw.player')
+        queue.push(LAYER_PLAYER, *self.player.sprite(alpha))
+        prof.end('draw.player')
+        
+        prof.begin('drawArena')
+        self.queueArena()
+        prof.end('drawArena')
+        
+        prof.begin('draw.flush')
+        queue.flush(screen, mark if self.presenter.needsRects() else None)
+        self.drawArena()
+        prof.end('draw.flush')
+        
+        prof.count('submissions', queue.submitted())
+        prof.count('blits_calls', queue.calls)
+        prof.count('enemies', len(self.enemies))
+        prof.count('enemy_bullets', len(self.enemy_bullets))
+        prof.count('player_bullets', len(self.player_bullets))
+        prof.count('pickups', len(self.tokens) + len(self.powerups))
+        prof.count('particles', self.psc.count())
+        
+    def updateIntro(self):
+        
+        self.starfield.update()
+        self.background_scroller.update()
+        self.screen_intro.update()
     
     def drawIntro(self):
         
-        self.starfield.update()
-        self.starfield.draw()
-        self.background_scroller.draw()
+        # the scroller is opaque so the stars go on top of it
+        self.background_scroller.draw(self.render_alpha)
+        self.starfield.draw(screen, self.render_alpha)
+        self.presenter.invalidateAll()
         self.screen_intro.draw()
         
-    def drawLifeLost(self):
+    def updateLifeLost(self):
         
         self.gamestate_delay += 1
         
-        if self.gamestate_delay == 1:
-            pass
-        else:
-            #self.starfield.update()
-            #self.starfield.draw()
+        if self.gamestate_delay > 1:
             self.psc.update()
-            self.drawArena()
-            self.screen_life_lost.draw()
+            self.screen_life_lost.update()
             
-        if self.gamestate_delay > self.fps * 4:
+        if self.gamestate_delay > LIFE_LOST_TICKS:
             self.gamestate_delay = 0
             self.resumeAfterLifeLost()
             if self.player.lives > 0:
@@ -1388,19 +1453,120 @@ class Game():
                 self.screen_game_over.setFinalScore()
                 self.gamestate = GAME_STATE_OVER
         
-    def drawGameOver(self):
+    def drawLifeLost(self):
+        
+        if self.gamestate_delay > 1:
+            #self.starfield.draw(screen)
+            self.render_queue.extend(LAYER_PARTICLES, self.psc.sprites(self.render_alpha))
+            for r in self.psc.bounds():
+                self.presenter.add(r)
+            self.queueArena()
+            self.render_queue.flush(screen)
+            self.drawArena()
+            self.screen_life_lost.draw()
+            self.presenter.add(self.screen_life_lost.rect())
+            
+    def updateGameOver(self):
         
         self.starfield.update()
-        self.starfield.draw()
-        self.background_scroller.draw()
+        self.background_scroller.update()
+        self.screen_game_over.update()
+        
+    def drawGameOver(self):
+        
+        # the scroller is opaque so the stars go on top of it
+        self.background_scroller.draw(self.render_alpha)
+        self.starfield.draw(screen, self.render_alpha)
+        self.presenter.invalidateAll()
         self.screen_game_over.draw()
         
+    def update(self):
+        
+        # advance the simulation by one tick, never touches the screen
+        self.frame += 1
+        
+        if self.gamestate == GAME_STATE_INTRO:
+            self.profiler.begin('update.screen')
+            self.updateIntro()
+            self.profiler.end('update.screen')
+        elif self.gamestate == GAME_STATE_IN_PROGRESS:
+            self.updateGame()
+        elif self.gamestate == GAME_STATE_LIFE_LOST:
+            self.profiler.begin('update.screen')
+            self.updateLifeLost()
+            self.profiler.end('update.screen')
+        elif self.gamestate == GAME_STATE_OVER:
+            self.profiler.begin('update.screen')
+            self.updateGameOver()
+            self.profiler.end('update.screen')
+            
+        # the sounds triggered this tick play together
+        self.profiler.begin('voices')
+        self.voices.update()
+        self.profiler.end('voices')
+            
+    def draw(self, alpha=1.0):
+        
+        # alpha is how far between the last two ticks to draw things, 1.0
+        # draws the current state
+        self.render_alpha = alpha
+        self.presenter.erase(screen)
+        
+        if self.gamestate == GAME_STATE_INTRO:
+            self.profiler.begin('draw.screen')
+            self.drawIntro()
+            self.profiler.end('draw.screen')
+        elif self.gamestate == GAME_STATE_IN_PROGRESS:
+            self.drawGame()
+        elif self.gamestate == GAME_STATE_LIFE_LOST:
+            self.profiler.begin('draw.screen')
+            self.drawLifeLost()
+            self.profiler.end('draw.screen')
+        elif self.gamestate == GAME_STATE_OVER:
+            self.profiler.begin('draw.screen')
+            self.drawGameOver()
+            self.profiler.end('draw.screen')
+        
+    def runHeadless(self, frames):
+        
+        # step the simulation as fast as the cpu allows, restarting
+        # whenever the game ends so every frame is spent in play
+        start = time.perf_counter()
+        
+        for frame in range(frames):
+            if self.gamestate == GAME_STATE_INTRO or self.gamestate == GAME_STATE_OVER:
+                self.spaceBarPressed()
+            self.update()
+            
+        elapsed = time.perf_counter() - start
+        return elapsed
         
     def run(self):
         
         done = False
         
+        # always record the last few seconds so a hitch can be looked at
+        # after it happened, the overlay just shows what is recorded
+        self.profiler = profiler.FrameProfiler((self.render_hz or self.fps) * 10)
+        overlay = profiler.ProfilerOverlay(self.profiler, self.font_path, 1000.0 / (self.render_hz or self.fps))
+        
+        # the simulation runs in fixed ticks of its own, however fast the
+        # frames are drawn. real time piles up in the accumulator and is
+        # spent a tick at a time, what is left over says how far towards
+        # the next tick the drawn frame should be
+        tick = 1.0 / self.fps
+        accumulator = 0.0
+        previous = time.perf_counter()
+        
         while not done:
+            
+            self.profiler.beginFrame()
+            
+            # a long stall (a drag of the window, a breakpoint) is not
+            # caught up, the game just pauses for it
+            now = time.perf_counter()
+            accumulator += min(now - previous, tick * self.max_steps)
+            previous = now
    
             for event in pygame.event.get(): 
                 if event.type == pygame.QUIT:  
@@ -1409,46 +1575,104 @@ class Game():
                 if event.type == pygame.KEYDOWN:
                     if (event.key == pygame.K_ESCAPE):
                         done = True
-                    elif (event.key == pygame.K_SPACE):
-                        self.spaceBarPressed()
-                    elif (event.key == pygame.K_z):
-                        self.fire()
-                    elif (event.key == pygame.K_LEFT):
-                        self.player.move(D_LEFT)
-                    elif (event.key == pygame.K_RIGHT):
-                        self.player.move(D_RIGHT)
-                    elif (event.key == pygame.K_UP):
-                        self.player.move(D_UP)
-                    elif (event.key == pygame.K_DOWN):
-                        self.player.move(D_DOWN)
+                    elif event.key in ACTION_KEYS:
+                        self.doAction(ACTION_KEYS[event.key])
                     elif (event.key == pygame.K_s):
                         pygame.image.save(screen, 'screenshot.png')
+                    elif (event.key == pygame.K_d):
+                        overlay.toggle()
+                    elif (event.key == pygame.K_a):
+                        self.profiler.writeCsv(time.strftime('profile_%Y%m%d_%H%M%S.csv'))
+            
+            # when drawing can't keep up several ticks run between frames,
+            # frames are skipped rather than the game slowing down
+            steps = 0
+            while accumulator >= tick and steps < self.max_steps:
+                self.update()
+                accumulator -= tick
+                steps += 1
+            if steps == self.max_steps:
+                # still behind, drop the backlog rather than spiral
+                accumulator = min(accumulator, tick)
+            self.profiler.count('sim_steps', steps)
                         
-                        
-            screen.fill((0,0,0))
-                        
-            if self.gamestate == GAME_STATE_INTRO:
-                
-                 game.drawIntro()
-                 
-            elif self.gamestate == GAME_STATE_IN_PROGRESS:
-                
-                game.drawGame()
-                
-            elif self.gamestate == GAME_STATE_LIFE_LOST:
-                
-                game.drawLifeLost()
-                
-            elif self.gamestate == GAME_STATE_OVER:
-                self.drawGameOver()
-                 
+            self.draw(min(accumulator / tick, 1.0))
+            rect = overlay.draw(screen)
+            if rect is not None:
+                self.presenter.add(rect)
+            
+            # the frame is timed up to the flip, the wait in tick() is idle time
+            self.profiler.begin('display.flip')
+            self.presenter.present()
+            self.profiler.end('display.flip')
+            self.profiler.endFrame()
  
-            clock.tick(self.fps)            
-            pygame.display.flip()
+            clock.tick(self.render_hz)            
+            
+        if self.input_log is not None:
+            self.input_log.frames = self.frame
+            self.input_log.final_hash = self.stateHash()
             
+    def runReplay(self, log):
         
-game = Game()
-game.run()
-pygame.quit()
-
+        # re-simulate a recorded session headless at full speed, the game
+        # must have been built with the seed the log was recorded with
+        actions = log.actionsByFrame()
+        start = time.perf_counter()
         
+        while self.frame < log.frames:
+            for action in actions.get(self.frame, ()):
+                self.doAction(action)
+            self.update()
+            
+        return time.perf_counter() - start
+            
+
+def main():
+    
+    parser = argparse.ArgumentParser(description='Shmup1 - simple retro shoot em up')
+    parser.add_argument('--headless', type=int, metavar='FRAMES', default=0,
+                        help='step the simulation FRAMES times with no display or audio and report the speed')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only update the parts of the display that changed each frame')
+    parser.add_argument('--stars', type=int, default=20, help='number of stars in the parallax starfield')
+    parser.add_argument('--seed', type=int, help='seed for the random streams, random if not given')
+    parser.add_argument('--record', metavar='FILE', help='record the seed and every action to FILE')
+    parser.add_argument('--replay', metavar='FILE', help='re-simulate a recorded session headless and check it matches')
+    parser.add_argument('--render-hz', type=int,
+                        help='frames drawn per second, 0 for as many as possible, the simulation rate ({}) if not given'.format(SIM_HZ))
+    parser.add_argument('--max-steps', type=int, default=5,
+                        help='most simulation ticks run between two drawn frames when drawing falls behind')
+    args = parser.parse_args()
+    
+    if args.replay:
+        log = replay.load(args.replay)
+        initPygame(headless=True)
+        game = Game(headless=True, seed=log.seed, sim_hz=log.sim_hz)
+        elapsed = game.runReplay(log)
+        match = 'matches' if game.stateHash() == log.final_hash else 'DOES NOT match'
+        print('replayed {} frames in {:.3f}s ({:.0f} frames/s), score {}, final state {} the recording'.format(
+              log.frames, elapsed, log.frames / max(elapsed, 1e-9), game.score, match))
+        pygame.quit()
+        return
+    
+    if args.headless > 0:
+        initPygame(headless=True)
+        game = Game(headless=True, seed=args.seed, stars=args.stars)
+        elapsed = game.runHeadless(args.headless)
+        print('{} frames in {:.3f}s ({:.0f} frames/s)'.format(args.headless, elapsed, args.headless / elapsed))
+    else:
+        initPygame()
+        game = Game(dirty_rects=args.dirty_rects, seed=args.seed, stars=args.stars,
+                    render_hz=args.render_hz, max_steps=args.max_steps)
+        if args.record:
+            game.input_log = replay.InputLog(game.seed, game.fps)
+        game.run()
+        if args.record:
+            game.input_log.save(args.record)
+        
+    pygame.quit()
+    
+    
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  shmupenv.py
+#
+#  the game as an environment for training agents. ShmupEnv wraps one
+#  headless Game in the usual reset/step interface: an action goes in, a
+#  tick (or a few) of simulation runs, and the observation, the reward
+#  (the score gained), whether the game ended and whether the episode ran
+#  out of time come back. nothing is ever drawn, the observation is the
+#  feature vector from observations.py and optionally its occupancy grid.
+#
+#  VecEnv runs many of them at once across worker processes. each worker
+#  owns a run of the environments and writes their observations, rewards
+#  and flags straight into shared memory arrays, so stepping them all
+#  sends only the actions down a pipe and a short reply back.
+#
+#  python shmupenv.py --envs 16 --workers 4 --steps 2000
+#
+import argparse
+import multiprocessing
+import multiprocessing.shared_memory
+import random
+import time
+import traceback
+import numpy as np
+import pygame
+import assetbundle
+import shmup1
+import observations
+
+# the actions an agent can take. movement is sticky, the player keeps
+# going the way it was last sent until sent another way
+ACTIONS = (
+    (),                                          # 0 nothing
+    (shmup1.ACTION_FIRE,),                       # 1 fire
+    (shmup1.ACTION_UP,),                         # 2 up
+    (shmup1.ACTION_DOWN,),                       # 3 down
+    (shmup1.ACTION_LEFT,),                       # 4 left
+    (shmup1.ACTION_RIGHT,),                      # 5 right
+    (shmup1.ACTION_UP, shmup1.ACTION_FIRE),      # 6 up and fire
+    (shmup1.ACTION_DOWN, shmup1.ACTION_FIRE),    # 7 down and fire
+    (shmup1.ACTION_LEFT, shmup1.ACTION_FIRE),    # 8 left and fire
+    (shmup1.ACTION_RIGHT, shmup1.ACTION_FIRE),   # 9 right and fire
+)
+
+#=======================================================================
+# single environment class
+#=======================================================================
+
+class ShmupEnv():
+
+    def __init__(self, seed = None, ticks_per_step = 1, max_ticks = 0, life_penalty = 0.0,
+                 grid = None, out = None, grid_out = None, **nearest):
+
+        # a headless game needs fonts for its screens but no display
+        if not pygame.font.get_init():
+            shmup1.initPygame(headless=True)
+
+        self.seeds          = random.Random(seed) # the seed of each episode comes from here
+        self.ticks_per_step = ticks_per_step      # ticks each action is held for
+        self.max_ticks      = max_ticks           # episodes are cut off after this many ticks, 0 for never
+        self.life_penalty   = life_penalty        # taken off the reward when a life is lost
+        self.ticks          = 0                   # ticks into the current episode
+        self.game           = shmup1.Game(headless=True, seed=self.seeds.getrandbits(64))
+        self.game.waitForAssets()
+
+        # out and grid_out let the observation be written straight into
+        # shared memory. grid is the (columns, rows) of the occupancy grid,
+        # nearest how many of each kind of entity the features keep
+        self.observer = observations.FeatureObserver(self.game, grid, out, grid_out, **nearest)
+
+    @property
+    def grid(self):
+
+        return self.observer.grid
+
+    def observe(self):
+
+        return self.observer.observe()
+
+    def info(self):
+
+        game = self.game
+        return {'score': game.score, 'lives': game.player.lives, 'ticks': self.ticks, 'seed': game.seed}
+
+    def reset(self, seed = None):
+
+        # a fresh game from the intro, same seed same episode
+        game = self.game
+        game.reseed(seed if seed is not None else self.seeds.getrandbits(64))
+        game.gamestate = shmup1.GAME_STATE_INTRO
+        game.doAction(shmup1.ACTION_START)
+        self.ticks = 0
+        return self.observe(), self.info()
+
+    def step(self, action):
+
+        game  = self.game
+        score = game.score
+        lives = game.player.lives
+
+        for a in ACTIONS[action]:
+            game.doAction(a)
+        for n in range(self.ticks_per_step):
+            game.update()
+            self.ticks += 1
+            if game.gamestate != shmup1.GAME_STATE_IN_PROGRESS:
+                break
+
+        # the few seconds after a life is lost take no input, so they are
+        # run straight through rather than handed to the agent
+        while game.gamestate == shmup1.GAME_STATE_LIFE_LOST:
+            game.update()
+
+        reward = float(game.score - score) - self.life_penalty * (lives - game.player.lives)
+        terminated = game.gamestate != shmup1.GAME_STATE_IN_PROGRESS
+        truncated = not terminated and self.max_ticks > 0 and self.ticks >= self.max_ticks
+        return self.observe(), reward, terminated, truncated, self.info()
+
+#=======================================================================
+# shared memory helpers
+#=======================================================================
+
+def sharedArray(shape, dtype, name = None):
+
+    # (the shared memory block, an array over it), a new block unless the
+    # name of one is given
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if name is None:
+        shm = multiprocessing.shared_memory.SharedMemory(create=True, size=max(size, 1))
+    else:
+        shm = multiprocessing.shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype, buffer=shm.buf)
+
+def sharedLayout(grid = None, **nearest):
+
+    # name -> (shape per environment, dtype) of each shared array
+    layout = {
+        'observations' : ((observations.featureSize(**nearest),), np.float32),
+        'rewards'      : ((), np.float32),
+        'terminated'   : ((), np.bool_),
+        'truncated'    : ((), np.bool_),
+    }
+    if grid is not None:
+        layout['grids'] = (observations.gridShape(grid), np.float32)
+    return layout
+
+def observerArgs(env_args):
+
+    # the environment arguments that shape the observation
+    names = ('grid', 'enemies', 'bullets', 'bombs', 'tokens', 'powerups')
+    return {name: value for name, value in env_args.items() if name in names}
+
+#=======================================================================
+# worker process
+#=======================================================================
+
+def worker(conn, names, count, begin, end, env_args):
+
+    # runs environments begin up to end of the count, writing into the
+    # shared arrays named in names. every command is answered with
+    # ('ok', result), or ('error', the traceback) if the worker failed,
+    # after which it stops
+    blocks = {}
+    arrays = {}
+    envs   = []
+    try:
+        for key, (shape, dtype) in sharedLayout(**observerArgs(env_args)).items():
+            blocks[key], arrays[key] = sharedArray((count,) + shape, dtype, names[key])
+        rows = range(begin, end)
+        seed = env_args.pop('seed')
+        grids = arrays.get('grids')
+        envs += [ShmupEnv(seed=None if seed is None else seed + i, out=arrays['observations'][i],
+                          grid_out=None if grids is None else grids[i], **env_args) for i in rows]
+        conn.send(('ok', None))
+
+        while True:
+            command, data = conn.recv()
+            if command == 'reset':
+                for env in envs:
+                    env.reset()
+                conn.send(('ok', None))
+            elif command == 'step':
+                # a finished episode starts the next one straight away, what
+                # came back is the final info of each finished episode. the
+                # reset overwrites the shared row, so the last observation
+                # goes back in the info as final_observation (and final_grid)
+                done = []
+                for env, i, action in zip(envs, rows, data):
+                    obs, reward, terminated, truncated, info = env.step(action)
+                    arrays['rewards'][i]    = reward
+                    arrays['terminated'][i] = terminated
+                    arrays['truncated'][i]  = truncated
+                    if terminated or truncated:
+                        info['final_observation'] = obs.copy()
+                        if env.grid is not None:
+                            info['final_grid'] = env.grid.copy()
+                        done.append((i, info))
+                        env.reset()
+                conn.send(('ok', done))
+            elif command == 'close':
+                break
+    except Exception:
+        try:
+            conn.send(('error', traceback.format_exc()))
+        except OSError:
+            pass
+    finally:
+        # everything viewing the blocks must go before they can close
+        envs.clear()
+        arrays.clear()
+        for shm in blocks.values():
+            shm.close()
+        conn.close()
+
+#=======================================================================
+# vectorised environment class
+#=======================================================================
+
+class VecEnv():
+
+    def __init__(self, count, workers = None, seed = None, **env_args):
+
+        self.count   = count
+        workers      = max(1, min(count, workers or multiprocessing.cpu_count()))
+        self.blocks  = {}
+        self.arrays  = {}
+        for key, (shape, dtype) in sharedLayout(**observerArgs(env_args)).items():
+            self.blocks[key], self.arrays[key] = sharedArray((count,) + shape, dtype)
+        names = {key: shm.name for key, shm in self.blocks.items()}
+
+        # the asset bundle is built here if it needs to be, before any
+        # worker opens it, rather than by every worker at once
+        assetbundle.openBundle(convert=False).close()
+
+        # the environments are split as evenly as they go between workers,
+        # spawned rather than forked so no parent pygame state is shared
+        context = multiprocessing.get_context('spawn')
+        self.conns   = []
+        self.workers = []
+        bounds = np.linspace(0, count, workers + 1).astype(int).tolist()
+        for begin, end in zip(bounds, bounds[1:]):
+            parent, child = context.Pipe()
+            args = dict(env_args, seed=seed)
+            p = context.Process(target=worker, args=(child, names, count, begin, end, args), daemon=True)
+            p.start()
+            child.close()
+            self.conns.append(parent)
+            self.workers.append((p, begin, end))
+
+        # every worker says when its environments are built
+        try:
+            for conn in self.conns:
+                self.receive(conn)
+        except RuntimeError:
+            self.close()
+            raise
+
+    def receive(self, conn):
+
+        # a worker's reply, raising with its traceback if it failed
+        try:
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            raise RuntimeError('an environment worker exited without replying')
+        if status == 'error':
+            raise RuntimeError('an environment worker failed:\n' + result)
+        return result
+
+    @property
+    def observations(self):
+
+        # a view into shared memory, overwritten by the next step
+        return self.arrays['observations']
+
+    @property
+    def grids(self):
+
+        # the occupancy grids if they were asked for, also shared
+        return self.arrays.get('grids')
+
+    def reset(self):
+
+        for conn in self.conns:
+            conn.send(('reset', None))
+        for conn in self.conns:
+            self.receive(conn)
+        return self.observations
+
+    def step(self, actions):
+
+        # every worker is sent its actions before any reply is waited on,
+        # so they all step at once
+        actions = np.asarray(actions).tolist()
+        for conn, (p, begin, end) in zip(self.conns, self.workers):
+            conn.send(('step', actions[begin:end]))
+        infos = {}
+        for conn in self.conns:
+            infos.update(self.receive(conn))
+        a = self.arrays
+        return a['observations'], a['rewards'], a['terminated'], a['truncated'], infos
+
+    def close(self):
+
+        for conn in self.conns:
+            try:
+                conn.send(('close', None))
+            except OSError:
+                pass
+        for p, begin, end in self.workers:
+            p.join()
+        self.arrays.clear()
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks.clear()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+#=======================================================================
+# throughput check
+#=======================================================================
+
+def main():
+
+    parser = argparse.ArgumentParser(description='step many shmup1 environments with random actions and report the speed')
+    parser.add_argument('--envs', type=int, default=8, help='environments stepped together')
+    parser.add_argument('--workers', type=int, help='worker processes, one per cpu if not given')
+    parser.add_argument('--steps', type=int, default=1000, help='steps of every environment')
+    parser.add_argument('--ticks-per-step', type=int, default=1, help='ticks each action is held for')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first environment, the others count up from it')
+    parser.add_argument('--grid', type=int, nargs=2, metavar=('COLUMNS', 'ROWS'), help='also build an occupancy grid this size')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    grid = tuple(args.grid) if args.grid else None
+    with VecEnv(args.envs, args.workers, seed=args.seed, ticks_per_step=args.ticks_per_step, grid=grid) as env:
+        env.reset()
+        episodes = []
+        start = time.perf_counter()
+        for n in range(args.steps):
+            obs, rewards, terminated, truncated, infos = env.step(rng.integers(0, len(ACTIONS), args.envs))
+            episodes += [info['score'] for info in infos.values()]
+        elapsed = time.perf_counter() - start
+
+    steps = args.steps * args.envs
+    print('{} env steps in {:.3f}s ({:.0f} steps/s over {} workers), {} episodes finished'.format(
+          steps, elapsed, steps / elapsed, len(env.workers), len(episodes)))
+    if episodes:
+        print('mean episode score {:.1f}'.format(sum(episodes) / len(episodes)))
+
+if __name__ == '__main__':
+    main()
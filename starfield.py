@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  starfield.py
+#
+#  parallax starfield. stars are split across layers, far layers have
+#  more, smaller and slower stars than near ones. every star in a layer
+#  moves at the layer's speed so a layer is just its stars drawn once into
+#  a screen sized surface that scrolls and wraps. the surface is run
+#  length encoded against its colour key, so drawing a layer costs two
+#  blits that skip the empty space, however many stars it holds.
+#
+import numpy as np
+import pygame
+import palettes
+
+# (share of the stars, star size, pixels per frame) from far to near
+STAR_LAYERS = ((0.4, 1, 1.0),
+               (0.3, 2, 2.0),
+               (0.2, 3, 4.0),
+               (0.1, 4, 7.0))
+
+STAR_COLOUR = palettes.COLOUR_PICO8_BLUE
+STAR_KEY    = palettes.COLOUR_PICO8_BLACK
+
+#=======================================================================
+# star layer class
+#=======================================================================
+
+class StarLayer():
+
+    def __init__(self, width, height, count, size, speed, rng):
+
+        self.height = height
+        self.count  = count
+        self.speed  = speed
+        self.offset = 0.0
+
+        # star positions are fixed within the layer, the layer scrolls
+        x = rng.integers(0, width, count)
+        y = rng.integers(0, height, count)
+
+        self.surface = pygame.Surface((width, height))
+        self.surface.fill(STAR_KEY)
+        star = pygame.Surface((size, size))
+        star.fill(STAR_COLOUR)
+        # stars near the bottom edge also go in at the top so they wrap whole
+        positions = list(zip(x.tolist(), y.tolist())) + [(sx, sy - height) for sx, sy in zip(x.tolist(), y.tolist()) if sy + size > height]
+        self.surface.blits([(star, p) for p in positions], doreturn=False)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+        self.surface.set_colorkey(STAR_KEY, pygame.RLEACCEL)
+
+    def update(self):
+
+        self.offset = (self.offset + self.speed) % self.height
+
+    def sprites(self, alpha = 1.0):
+
+        # alpha of the way from the last tick's offset to this one
+        y = int((self.offset - self.speed * (1.0 - alpha)) % self.height)
+        return [(self.surface, (0, y)), (self.surface, (0, y - self.height))]
+
+    def draw(self, surface):
+
+        return surface.blits(self.sprites())
+
+#=======================================================================
+# starfield class
+#=======================================================================
+
+class StarField():
+
+    def __init__(self, width, height, rng, stars = 20):
+
+        # rng is a random.Random, the layers are laid out by a numpy
+        # generator seeded from it
+        gen = np.random.default_rng(rng.getrandbits(64))
+        counts = [int(round(share * stars)) for share, _, _ in STAR_LAYERS]
+        self.layers = [StarLayer(width, height, n, size, speed, gen)
+                       for n, (_, size, speed) in zip(counts, STAR_LAYERS)]
+
+    def count(self):
+
+        return sum(layer.count for layer in self.layers)
+
+    def update(self):
+
+        for layer in self.layers:
+            layer.update()
+
+    def sprites(self, alpha = 1.0):
+
+        sprites = []
+        for layer in self.layers:
+            sprites += layer.sprites(alpha)
+        return sprites
+
+    def draw(self, surface, alpha = 1.0):
+
+        return surface.blits(self.sprites(alpha))
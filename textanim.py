@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  textanim.py
+#
+#  animated text drawn from cached frames. each frame of an animation is
+#  the whole line of letters composed once into one run length encoded,
+#  colour keyed surface, so drawing a line costs a single blit however
+#  many letters it has. frames are made the first time they are shown and
+#  kept, after one pass through the animation it costs next to nothing.
+#
+#  the wave repeats every 360 degrees so its cycle is sampled at a fixed
+#  number of phases, the nearest of which is drawn. the spread runs
+#  through a fixed number of spacings and then stops.
+#
+import numpy as np
+import pygame
+
+WAVE_STEPS = 120 # phases the wave cycle is sampled at, 3 degrees apart
+
+def composeFrame(letters, positions, size, key):
+
+    surface = pygame.Surface(size)
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert()
+    surface.fill(key)
+    surface.blits(list(zip(letters, positions)), doreturn=False)
+    surface.set_colorkey(key, pygame.RLEACCEL)
+    return surface
+
+#=======================================================================
+# wave text class - letters bobbing on a travelling sine wave
+#=======================================================================
+
+class WaveText():
+
+    def __init__(self, letters, spacing, height, speed, steps = WAVE_STEPS):
+
+        # letter i is sin(angle + i * (speed + 360 / letters)) * height
+        # below its line, the angle moving on by speed every letter
+        self.letters = letters
+        self.spacing = spacing
+        self.height  = height
+        self.steps   = steps
+        self.key     = letters[0].get_colorkey() or (0, 0, 0)
+        self.frames  = [None] * steps
+        self.size    = ((len(letters) - 1) * spacing + max(c.get_width() for c in letters),
+                        2 * height + max(c.get_height() for c in letters))
+
+        # sine lookup, the offset of every letter at every phase
+        phases = np.arange(steps)[:, None] * (360.0 / steps) + np.arange(len(letters))[None, :] * (speed + 360.0 / len(letters))
+        self.offsets = (np.sin(np.radians(phases)) * height).tolist()
+
+    def phase(self, angle):
+
+        return int(round((angle % 360) * self.steps / 360.0)) % self.steps
+
+    def offset(self, angle, letter):
+
+        # how far the letter sits below its line at this angle
+        return self.offsets[self.phase(angle)][letter]
+
+    def frame(self, angle):
+
+        n = self.phase(angle)
+        if self.frames[n] is None:
+            positions = [(i * self.spacing, self.height + y) for i, y in enumerate(self.offsets[n])]
+            self.frames[n] = composeFrame(self.letters, positions, self.size, self.key)
+        return self.frames[n]
+
+    def draw(self, surface, angle, x, y):
+
+        # y is the line the letters bob about
+        return surface.blit(self.frame(angle), (x, y - self.height))
+
+#=======================================================================
+# spread text class - letters moving apart from each other
+#=======================================================================
+
+class SpreadText():
+
+    def __init__(self, letters, spacings):
+
+        # one frame for each spacing from 0 up to spacings - 1
+        self.letters = letters
+        self.key     = letters[0].get_colorkey() or (0, 0, 0)
+        self.frames  = [None] * spacings
+        self.height  = max(c.get_height() for c in letters)
+
+    def frame(self, spacing):
+
+        if self.frames[spacing] is None:
+            width = (len(self.letters) - 1) * spacing + max(c.get_width() for c in self.letters)
+            positions = [(i * spacing, 0) for i in range(len(self.letters))]
+            self.frames[spacing] = composeFrame(self.letters, positions, (width, self.height), self.key)
+        return self.frames[spacing]
+
+    def draw(self, surface, spacing, x, y):
+
+        return surface.blit(self.frame(spacing), (x, y))
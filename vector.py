@@ -3,10 +3,26 @@
 #
 #  vector.py
 #  
+#  Vector2 is a single 2d vector. Vector2Array holds a whole batch of them
+#  in one numpy array and does the same operations on every row at once,
+#  and its view() hands out Vector2s that read and write a row of the
+#  array, so an entity can keep its pos and vel in a shared array and
+#  still be moved one at a time when that is simpler.
+#  
 import math
+import numpy as np
+
+def flatView(array):
+    
+    # every element of a contiguous array as a 1d memoryview. indexing it
+    # gives and takes plain floats and ints, far quicker than indexing the
+    # array itself. row r of a two column array is at 2r and 2r + 1
+    return memoryview(array).cast('B').cast(array.dtype.char)
 
 class Vector2(object):
     
+    __slots__ = ('x', 'y')
+    
     def __init__(self,x,y):
         
         self.x = float(x)
@@ -135,7 +151,218 @@ class Vector2(object):
         # returns angle in degrees between this vector and other vector
         # below the line it goes 0-180, above -180-0
         return math.degrees(self.angleBetween(other))
-        
 
+
+# ======================================================================
+# vector2 view class - a Vector2 that lives in a row of a Vector2Array
+# ======================================================================
+
+class Vector2View(Vector2):
+    
+    __slots__ = ('owner', 'index')
     
+    def __init__(self, owner, index):
+        
+        # goes through the owner rather than holding the numpy array
+        # so the view still works after the array has grown
+        self.owner = owner
+        self.index = index
+        
+    @property
+    def x(self):
+        
+        return self.owner.flat[self.index * 2]
+        
+    @x.setter
+    def x(self, value):
+        
+        self.owner.flat[self.index * 2] = value
+        
+    @property
+    def y(self):
+        
+        return self.owner.flat[self.index * 2 + 1]
+        
+    @y.setter
+    def y(self, value):
+        
+        self.owner.flat[self.index * 2 + 1] = value
+        
+# ======================================================================
+# vector2 array class
+# ======================================================================
 
+class Vector2Array(object):
+    
+    def __init__(self, capacity = 64):
+        
+        self.array = np.zeros((max(1, capacity), 2))
+        self.flat  = flatView(self.array) # the array one float at a time
+        self.count = 0  # rows below this have been handed out
+        self.free  = [] # rows handed out then given back, reused first
+        
+    def __len__(self):
+        
+        return self.count
+        
+    def grow(self, capacity):
+        
+        if capacity > len(self.array):
+            bigger = np.zeros((max(capacity, len(self.array) * 2), 2))
+            bigger[:self.count] = self.array[:self.count]
+            self.array = bigger
+            self.flat  = flatView(bigger)
+            
+    def alloc(self, x = 0.0, y = 0.0):
+        
+        # hand out a row, rows never move so an index stays good until freed
+        if self.free:
+            index = self.free.pop()
+        else:
+            self.grow(self.count + 1)
+            index = self.count
+            self.count += 1
+        self.array[index] = (x, y)
+        return index
+        
+    def release(self, index):
+        
+        self.free.append(index)
+        
+    def view(self, index = None):
+        
+        # a Vector2 backed by a row, a new row if no index is given
+        if index is None:
+            index = self.alloc()
+        return Vector2View(self, index)
+        
+    def rows(self, rows = None):
+        
+        # the rows an operation works on, every handed out row by default.
+        # rows can be anything numpy accepts as an index
+        if rows is None:
+            return self.array[:self.count]
+        return self.array[rows]
+        
+    @property
+    def x(self):
+        
+        return self.array[:self.count, 0]
+        
+    @property
+    def y(self):
+        
+        return self.array[:self.count, 1]
+        
+    def values(self, other, rows):
+        
+        # other as something that broadcasts against the rows
+        if isinstance(other, Vector2Array):
+            return other.rows(rows)
+        if isinstance(other, Vector2):
+            return (other.x, other.y)
+        return np.asarray(other, dtype=float)
+        
+    def store(self, values, rows):
+        
+        if rows is None:
+            self.array[:self.count] = values
+        else:
+            self.array[rows] = values
+            
+    def add(self, other, rows = None):
+        
+        if rows is None:
+            self.array[:self.count] += self.values(other, rows)
+        else:
+            self.array[rows] += self.values(other, rows)
+            
+    def sub(self, other, rows = None):
+        
+        if rows is None:
+            self.array[:self.count] -= self.values(other, rows)
+        else:
+            self.array[rows] -= self.values(other, rows)
+            
+    def mult(self, m, rows = None):
+        
+        # m is a scalar or one value per row
+        m = np.asarray(m, dtype=float)
+        if m.ndim == 1:
+            m = m[:, np.newaxis]
+        self.store(self.rows(rows) * m, rows)
+        
+    def div(self, d, rows = None):
+        
+        d = np.asarray(d, dtype=float)
+        if d.ndim == 1:
+            d = d[:, np.newaxis]
+        self.store(self.rows(rows) / d, rows)
+        
+    def mag(self, rows = None):
+        
+        # the length of every vector
+        v = self.rows(rows)
+        return np.hypot(v[:, 0], v[:, 1])
+        
+    def normalise(self, rows = None):
+        
+        # zero length vectors are left alone, as Vector2 does
+        v = self.rows(rows)
+        m = np.hypot(v[:, 0], v[:, 1])
+        m[m == 0] = 1.0
+        self.store(v / m[:, np.newaxis], rows)
+        
+    def setFromAngle(self, angle_degrees, rows = None):
+        
+        # one angle for every row or one angle per row
+        a = np.radians(angle_degrees)
+        if np.ndim(a) == 0:
+            self.store((math.cos(a), math.sin(a)), rows)
+        else:
+            self.store(np.column_stack((np.cos(a), np.sin(a))), rows)
+        
+    def rotate(self, angle_radians, rows = None):
+        
+        # angle_radians is one angle for every row or one angle per row
+        v = self.rows(rows)
+        cos = np.cos(angle_radians)
+        sin = np.sin(angle_radians)
+        x = v[:, 0] * cos - v[:, 1] * sin
+        y = v[:, 0] * sin + v[:, 1] * cos
+        self.store(np.column_stack((x, y)), rows)
+        
+    def rotate_degrees(self, angle_degrees, rows = None):
+        
+        self.rotate(np.radians(angle_degrees), rows)
+        
+    def heading(self, rows = None):
+        
+        # angle in radians of every vector, atan2 already gives 0 for a
+        # zero length vector so this matches Vector2.headingRadians
+        v = self.rows(rows)
+        return np.arctan2(v[:, 1], v[:, 0])
+        
+    def headingDeg360(self, rows = None):
+        
+        return np.degrees(self.heading(rows)) % 360.0
+        
+    def limit(self, minn, maxn, rows = None):
+        
+        # clamps each component, as Vector2.limit does
+        self.store(np.clip(self.rows(rows), minn, maxn), rows)
+        
+    def dot(self, other, rows = None):
+        
+        v = self.rows(rows)
+        o = np.broadcast_to(self.values(other, rows), v.shape)
+        return v[:, 0] * o[:, 0] + v[:, 1] * o[:, 1]
+        
+    def angleBetween(self, other, rows = None):
+        
+        # angle in radians between each vector and other
+        v = self.rows(rows)
+        o = np.broadcast_to(self.values(other, rows), v.shape)
+        cross = v[:, 0] * o[:, 1] - v[:, 1] * o[:, 0]
+        dot = v[:, 0] * o[:, 0] + v[:, 1] * o[:, 1]
+        return np.arctan2(cross, dot)
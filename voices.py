@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  voices.py
+#
+#  a budget for the mixer. every sound belongs to a category and each
+#  category has mixer channels of its own, so a storm of explosions can
+#  never take the channel the player's death cue needs. sounds are not
+#  played when they are triggered, triggers are collected over a tick and
+#  played together at the end of it:
+#
+#    - the same sound triggered more than once in a tick plays once
+#    - a sound played again within its cooldown is dropped
+#    - the highest priority triggers get the free channels first
+#    - with no channel free a trigger steals the lowest priority voice in
+#      its category, the oldest if there is a tie, as long as that voice
+#      is no more important than itself, otherwise it is dropped
+#    - a sound with no cue yet, still loading say, is dropped
+#
+import pygame
+
+#=======================================================================
+# cue class - a sound and the rules for playing it
+#=======================================================================
+
+class Cue():
+
+    def __init__(self, name, sounds, category, priority, cooldown):
+
+        self.name     = name
+        self.sounds   = sounds   # variants, the trigger says which to play
+        self.category = category
+        self.priority = priority # higher wins channels and steals from lower
+        self.cooldown = cooldown # ticks before it can play again
+        self.last     = None     # tick it last played
+
+#=======================================================================
+# voice manager class
+#=======================================================================
+
+class VoiceManager():
+
+    def __init__(self, categories):
+
+        # categories is name -> channels reserved for it. every channel is
+        # reserved so pygame never hands one out behind our back
+        total = sum(categories.values())
+        if pygame.mixer.get_num_channels() < total:
+            pygame.mixer.set_num_channels(total)
+        pygame.mixer.set_reserved(total)
+
+        self.channels = {}  # category -> [channel]
+        self.voices   = {}  # channel -> (priority, tick started) of what it plays
+        n = 0
+        for name, count in categories.items():
+            self.channels[name] = [pygame.mixer.Channel(i) for i in range(n, n + count)]
+            n += count
+
+        self.cues    = {}
+        self.pending = {}   # cue name -> variant, the triggers this tick
+        self.tick    = 0
+        self.stats   = {'triggered': 0, 'coalesced': 0, 'cooling': 0, 'played': 0, 'stolen': 0, 'dropped': 0}
+
+    def add(self, name, sounds, category, priority, cooldown = 0):
+
+        if not isinstance(sounds, (list, tuple)):
+            sounds = [sounds]
+        self.cues[name] = Cue(name, sounds, category, priority, cooldown)
+
+    def play(self, name, variant = 0):
+
+        # the first trigger of a tick picks the variant
+        self.stats['triggered'] += 1
+        if name in self.pending:
+            self.stats['coalesced'] += 1
+        else:
+            self.pending[name] = variant
+
+    def channelFor(self, cue):
+
+        # a free channel, else the least important voice the cue can steal
+        victim = None
+        for channel in self.channels[cue.category]:
+            if not channel.get_busy():
+                return channel, False
+            voice = self.voices.get(channel, (0, 0))
+            if victim is None or voice < self.voices.get(victim, (0, 0)):
+                victim = channel
+        if victim is not None and self.voices.get(victim, (0, 0))[0] <= cue.priority:
+            return victim, True
+        return None, False
+
+    def update(self):
+
+        # plays what was triggered this tick, called once per tick
+        if self.pending:
+            cues = [self.cues[name] for name in self.pending if name in self.cues]
+            self.stats['dropped'] += len(self.pending) - len(cues)
+            cues.sort(key=lambda c: c.priority, reverse=True)
+            for cue in cues:
+                if cue.last is not None and self.tick - cue.last < cue.cooldown:
+                    self.stats['cooling'] += 1
+                    continue
+                channel, stolen = self.channelFor(cue)
+                if channel is None:
+                    self.stats['dropped'] += 1
+                    continue
+                if stolen:
+                    self.stats['stolen'] += 1
+                channel.play(cue.sounds[self.pending[cue.name]])
+                self.voices[channel] = (cue.priority, self.tick)
+                cue.last = self.tick
+                self.stats['played'] += 1
+            self.pending.clear()
+        self.tick += 1
+
+#=======================================================================
+# Null voice manager class - stands in when there is no mixer
+#=======================================================================
+
+class NullVoiceManager():
+
+    def __init__(self, categories = None):
+
+        self.stats = {}
+
+    def add(self, name, sounds, category, priority, cooldown = 0):
+
+        pass
+
+    def play(self, name, variant = 0):
+
+        pass
+
+    def update(self):
+
+        pass